@@ -0,0 +1,911 @@
+"""
+    Local SCPI emulator of the SDS5034, SPD3303 and DG1032Z
+
+    Serves the subset of SCPI used by this package over a raw TCP socket, so
+    that the device classes can be tested and benchmarked without hardware.
+    Connect with transport='socket':
+
+        with Emulator('SDS5034', latency=1e-3) as emu:
+            sds = SDS5034('127.0.0.1', transport='socket', port=emu.port)
+
+    Run stand-alone with:
+
+        python -m SiglentDevices.Emulator SDS5034 --port 5025
+"""
+
+import socket, struct, threading, time, re
+import numpy as np
+
+class EmulatedDevice(object):
+    """Base class for emulated device state and command handling
+
+        Commands are dispatched on a normalized header: each node reduced to its
+        SCPI short form (first four characters, or three if the fourth is a
+        vowel), with numeric suffixes removed and passed to the handler.
+        For example "CHANnel2:SCALe?" is handled by self.commands['CHAN:SCAL?']
+        with nums = [2].
+
+        Attributes:
+
+            IDN (str): response to *IDN?
+            commands (dict): handler functions keyed by normalized header,
+                            called as fn(nums, args). Queries return a string
+                            or bytes (binary block)
+            errors (list): error queue, read by SYST:ERR?
+            esr (int): standard event status register, read and cleared by *ESR?
+    """
+
+    IDN = 'Emulated,SCPI device,0,0'
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.errors = []
+        self.esr = 0
+        self.commands = {}
+        self.add_commands({
+                         '*IDN?': lambda nums, args: self.IDN,
+                         '*OPC?': lambda nums, args: '1',
+                         '*OPC':  lambda nums, args: None,
+                         '*CLS':  lambda nums, args: self.errors.clear(),
+                         '*RST':  lambda nums, args: self.reset(),
+                         '*ESR?': lambda nums, args: self._read_esr(),
+                         'SYST:ERR?': self._syst_err,
+                        })
+        self.reset()
+
+    @staticmethod
+    def normalize(header):
+        """Get normalized header and numeric suffixes
+
+        Args:
+            header (str): command header, ex: CHANnel2:SCALe?
+
+        Returns:
+            tuple: (str, list) normalized header and list of int suffixes
+        """
+        header = header.strip().lstrip(':').upper()
+        query = header.endswith('?')
+        header = header.rstrip('?')
+
+        if header.startswith('*'):
+            return header + ('?' if query else ''), []
+
+        nodes = []
+        nums = []
+        for node in header.split(':'):
+            match = re.fullmatch(r'([A-Z_]+?)(\d*)', node)
+            if match is None:
+                nodes.append(node)
+                continue
+            name, num = match.groups()
+            if num:
+                nums.append(int(num))
+            if len(name) > 3:
+                name = name[:3] if name[3] in 'AEIOU' else name[:4]
+            nodes.append(name)
+
+        return ':'.join(nodes) + ('?' if query else ''), nums
+
+    def add_commands(self, commands):
+        """Add command handlers
+
+        Args:
+            commands (dict): handler functions keyed by header in any SCPI form
+        """
+        for header, fn in commands.items():
+            self.commands[self.normalize(header)[0]] = fn
+
+    def handle(self, message):
+        """Handle a single command
+
+        Args:
+            message (bytes): single command, header and arguments
+
+        Returns:
+            str|bytes|None: response to query
+        """
+
+        # split header and arguments, binary blocks may end in whitespace
+        message = message.lstrip()
+        if not re.search(rb'#[1-9]', message):
+            message = message.rstrip()
+        if not message:
+            return None
+        parts = message.split(b' ', 1)
+        header = parts[0].decode('ascii', errors='replace')
+        args = parts[1] if len(parts) > 1 else b''
+
+        # binary arguments are kept as bytes, others split to strings
+        if args.find(b'#') >= 0 and re.search(rb'#[1-9]', args):
+            idx = args.find(b'#')
+            args = [a.strip() for a in args[:idx].decode('ascii').split(',') if a.strip()] + [args[idx:]]
+        else:
+            args = [a.strip() for a in args.decode('ascii').split(',')] if args else []
+
+        key, nums = self.normalize(header)
+
+        with self.lock:
+            try:
+                fn = self.commands[key]
+            except KeyError:
+                self.errors.append('-113,"Undefined header"')
+                return None
+
+            try:
+                return fn(nums, args)
+            except Exception:
+                self.errors.append('-224,"Illegal parameter value"')
+                return None
+
+    def reset(self):
+        """Return device to default state"""
+        pass
+
+    def touch(self, **settings):
+        """Emulate operating the front panel: set the user request bit of the ESR
+
+        Args:
+            settings: device attributes to change
+        """
+        with self.lock:
+            for key, value in settings.items():
+                setattr(self, key, value)
+            self.esr |= 0b01000000
+
+    def _read_esr(self):
+        esr = self.esr
+        self.esr = 0
+        return str(esr)
+
+    def _syst_err(self, nums, args):
+        if self.errors:
+            return self.errors.pop(0)
+        return '0,"No error"'
+
+class EmulatedSDS5034(EmulatedDevice):
+    """Emulate the Siglent SDS5034X oscilloscope
+
+        Each channel holds a noisy sine wave with frequency proportional to
+        the channel number, regenerated on each trigger. In sequence mode,
+        each trigger acquires sequence_count frames with a phase shift between
+        them.
+
+        Attributes:
+
+            codes (np.ndarray): int8 adc codes of the last frame, shape (channel, npts)
+            frames (np.ndarray): int8 adc codes of all frames, shape (frame, channel, npts)
+            frame_times (np.ndarray): trigger time of each frame, seconds since midnight
+            npts (int): memory depth (points per frame)
+            maxpoint (int): maximum number of points per WAV:DATA? transfer
+            trigger_period (float): seconds between arming a single trigger and acquisition
+            measure_update (float|None): if None, simple measurements are of the current
+                waveform. Else, while running, each MEAS:SIMP:VAL? is of a new acquisition
+                and a change of source takes effect after this many seconds
+    """
+
+    IDN = 'Siglent Technologies,SDS5034X,SDSEMULATOR00001,1.5.2.0'
+    TDIV_ENUM = (200e-12, 500e-12, 1e-9, 2e-9, 5e-9, 10e-9, 20e-9, 50e-9,
+                 100e-9, 200e-9, 500e-9, 1e-6, 2e-6, 5e-6, 10e-6, 20e-6, 50e-6,
+                 100e-6, 200e-6, 500e-6, 1e-3, 2e-3, 5e-3, 10e-3, 20e-3, 50e-3,
+                 100e-3, 200e-3, 500e-3, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+    # adc codes per vertical division at 8 bits
+    CODE_PER_DIV = 30.0
+
+    # items in MEAS:SIMP:VAL? ALL
+    MEASURE_ALL = ('PKPK', 'MAX', 'MIN', 'AMPL', 'MEAN', 'STDEV', 'RMS', 'MEDIAN',
+                   'PER', 'FREQ', 'DUTY')
+
+    def __init__(self, npts=10000, maxpoint=5000, trigger_period=0, measure_update=None):
+
+        self.npts = int(npts)
+        self.maxpoint = int(maxpoint)
+        self.trigger_period = trigger_period
+        self.measure_update = measure_update
+
+        super().__init__()
+
+        onoff = lambda val: 'ON' if val else 'OFF'
+        tobool = lambda val: val.upper() in ('ON', '1')
+
+        self.add_commands({
+
+            # acquisition
+            'ACQ:STAT?': lambda n, a: str(int(self.run)),
+            'ACQ:STAT':  lambda n, a: self._set_run(a[0].upper() == 'RUN'),
+            'ACQ:RES?':  lambda n, a: f'{self.adc_bit}Bits',
+            'ACQ:RES':   lambda n, a: setattr(self, 'adc_bit', int(a[0].upper().rstrip('BITS'))),
+            'ACQ:SEQ?':  lambda n, a: onoff(self.sequence),
+            'ACQ:SEQ':   lambda n, a: self._set_sequence(sequence=tobool(a[0])),
+            'ACQ:SEQ:COUN?': lambda n, a: str(self.sequence_count),
+            'ACQ:SEQ:COUN':  lambda n, a: self._set_sequence(sequence_count=int(a[0])),
+            'ACQ:SRAT?': lambda n, a: f'{self.npts/(10*self.tdiv):E}',
+            'ACQ:SRAT':  lambda n, a: self._set_srate(float(a[0])),
+            'ACQ:MMAN':  lambda n, a: setattr(self, 'mmanagement', a[0].upper()),
+            'ACQ:MMAN?': lambda n, a: self.mmanagement,
+
+            # channels
+            'CHAN:COUP?': lambda n, a: self.ch[n[0]]['coupling'],
+            'CHAN:COUP':  lambda n, a: self.ch[n[0]].__setitem__('coupling', a[0].upper()),
+            'CHAN:IMP?':  lambda n, a: self.ch[n[0]]['impedance'],
+            'CHAN:IMP':   lambda n, a: self.ch[n[0]].__setitem__('impedance', 'ONEMeg' if a[0].upper().startswith('ONEM') else 'FIFTy'),
+            'CHAN:OFFS?': lambda n, a: f"{self.ch[n[0]]['offset']:E}",
+            'CHAN:OFFS':  lambda n, a: self.ch[n[0]].__setitem__('offset', float(a[0])),
+            'CHAN:PROB?': lambda n, a: f"{self.ch[n[0]]['probe']:E}",
+            'CHAN:PROB':  lambda n, a: self._set_probe(n[0], a[0]),
+            'CHAN:SCAL?': lambda n, a: f"{self.ch[n[0]]['scale']:E}",
+            'CHAN:SCAL':  lambda n, a: self.ch[n[0]].__setitem__('scale', float(a[0])),
+            'CHAN:SWIT?': lambda n, a: onoff(self.ch[n[0]]['switch']),
+            'CHAN:SWIT':  lambda n, a: self.ch[n[0]].__setitem__('switch', tobool(a[0])),
+            'CHAN:UNIT?': lambda n, a: self.ch[n[0]]['unit'],
+            'CHAN:UNIT':  lambda n, a: self.ch[n[0]].__setitem__('unit', a[0].upper()),
+
+            # timebase
+            'TIM:DEL?':  lambda n, a: f'{self.delay:E}',
+            'TIM:DEL':   lambda n, a: setattr(self, 'delay', float(a[0])),
+            'TIM:SCAL?': lambda n, a: f'{self.tdiv:E}',
+            'TIM:SCAL':  lambda n, a: setattr(self, 'tdiv', float(a[0])),
+
+            # trigger
+            'TRIG:MODE?': lambda n, a: self.trig_mode,
+            'TRIG:MODE':  lambda n, a: self._set_trig_mode(a[0]),
+            'TRIG:STAT?': lambda n, a: self._trig_status(),
+            'TRIG:RUN':   lambda n, a: self._arm(),
+            'TRIG:STOP':  lambda n, a: self._set_run(False),
+
+            # waveform transfer
+            'WAV:SOUR?':  lambda n, a: f'C{self.wave_ch}',
+            'WAV:SOUR':   lambda n, a: setattr(self, 'wave_ch', int(a[0].upper().lstrip('C'))),
+            'WAV:STAR?':  lambda n, a: str(self.wave_start),
+            'WAV:STAR':   lambda n, a: setattr(self, 'wave_start', int(float(a[0]))),
+            'WAV:INT?':   lambda n, a: str(self.wave_interval),
+            'WAV:INT':    lambda n, a: setattr(self, 'wave_interval', int(float(a[0]))),
+            'WAV:POIN?':  lambda n, a: f'{self.wave_points:E}',
+            'WAV:POIN':   lambda n, a: setattr(self, 'wave_points', int(float(a[0]))),
+            'WAV:MAXP?':  lambda n, a: f'{self.maxpoint:E}',
+            'WAV:WIDT?':  lambda n, a: self.wave_width,
+            'WAV:WIDT':   lambda n, a: setattr(self, 'wave_width', a[0].upper()),
+            'WAV:SEQ?':   lambda n, a: '{},{}'.format(*self.wave_sequence),
+            'WAV:SEQ':    lambda n, a: setattr(self, 'wave_sequence', (int(a[0]), int(a[1]) if len(a) > 1 else 1)),
+            'WAV:PRE?':   lambda n, a: self._block(self.wavedesc()),
+            'WAV:DATA?':  lambda n, a: self._block(self._wave_data()),
+
+            # history
+            'HIST?':      lambda n, a: onoff(self.history),
+            'HIST':       lambda n, a: setattr(self, 'history', tobool(a[0])),
+            'HIST:FRAM?': lambda n, a: str(self.history_frame),
+            'HIST:FRAM':  lambda n, a: setattr(self, 'history_frame', int(a[0])),
+            'HIST:TIME?': lambda n, a: self._history_time(),
+
+            # measurements
+            'MEAS?':      lambda n, a: onoff(self.measure),
+            'MEAS':       lambda n, a: setattr(self, 'measure', tobool(a[0])),
+            'MEAS:MODE?': lambda n, a: self.measure_mode,
+            'MEAS:MODE':  lambda n, a: setattr(self, 'measure_mode', 'SIMPle' if a[0].upper().startswith('SIMP') else 'ADVanced'),
+            'MEAS:SIMP:SOUR?': lambda n, a: f'C{self.simple_source}',
+            'MEAS:SIMP:SOUR':  lambda n, a: self._set_simple_source(int(a[0].upper().lstrip('C'))),
+            'MEAS:SIMP:ITEM':  lambda n, a: self.simple_items.__setitem__(a[0].upper(), tobool(a[1])),
+            'MEAS:SIMP:VAL?':  lambda n, a: self._simple_value(a[0]),
+            'MEAS:ADV:LIN?':   lambda n, a: str(self.adv_lines),
+            'MEAS:ADV:LIN':    lambda n, a: setattr(self, 'adv_lines', int(a[0])),
+            'MEAS:ADV:STYL?':  lambda n, a: f'M{self.adv_style}',
+            'MEAS:ADV:STYL':   lambda n, a: setattr(self, 'adv_style', int(a[0].upper().lstrip('M'))),
+            'MEAS:ADV:P?':     lambda n, a: onoff(self.adv[n[0]]['state']),
+            'MEAS:ADV:P':      lambda n, a: self.adv[n[0]].__setitem__('state', tobool(a[0])),
+            'MEAS:ADV:P:TYPE?': lambda n, a: self.adv[n[0]]['type'],
+            'MEAS:ADV:P:TYPE':  lambda n, a: self.adv[n[0]].__setitem__('type', a[0].upper()),
+            'MEAS:ADV:P:SOUR?': lambda n, a: f"C{self.adv[n[0]]['source'][n[1]]}",
+            'MEAS:ADV:P:SOUR':  lambda n, a: self.adv[n[0]]['source'].__setitem__(n[1], int(a[0].upper().lstrip('C'))),
+            'MEAS:ADV:P:VAL?':  lambda n, a: self._adv_value(n[0]),
+
+            # system
+            'SYST:REB':   lambda n, a: self.reset(),
+        })
+
+    def reset(self):
+        """Return device to default state"""
+
+        self.run = True
+        self.adc_bit = 8
+        self.sequence = False
+        self.sequence_count = 2
+        self.mmanagement = 'AUTO'
+        self.delay = 0.0
+        self.tdiv = 1e-3
+        self.trig_mode = 'AUTO'
+        self.trig_armed = None
+
+        self.ch = {i: {'coupling': 'DC',
+                       'impedance': 'ONEMeg',
+                       'offset': 0.0,
+                       'probe': 1.0,
+                       'scale': 1.0,
+                       'switch': i <= 2,
+                       'unit': 'V',
+                      } for i in range(1, 5)}
+
+        self.wave_ch = 1
+        self.wave_start = 0
+        self.wave_interval = 1
+        self.wave_points = 0
+        self.wave_width = 'BYTE'
+        self.wave_sequence = (1, 1)
+
+        self.history = False
+        self.history_frame = 1
+
+        self.measure = False
+        self.measure_mode = 'SIMPle'
+        self.simple_source = 1
+        self.simple_measured = 1
+        self.simple_changed = 0
+        self.simple_items = {}
+        self.adv_lines = 5
+        self.adv_style = 1
+        self.adv = {i: {'state': False, 'type': 'PKPK', 'source': {1: 1, 2: 1}}
+                    for i in range(1, 13)}
+
+        self.nacquisitions = 0
+        self.acquire()
+
+    # acquisition
+    def acquire(self):
+        """Generate new waveform data for all channels (one trigger)
+
+            self.codes is an array of int8 codes with shape (channel, npts),
+            in units of 8 bit adc codes. self.frames holds all frames of a
+            sequence acquisition, with shape (frame, channel, npts)
+        """
+        rng = np.random.default_rng(self.nacquisitions)
+        nframes = self.sequence_count if self.sequence else 1
+
+        t = np.arange(self.npts) / self.npts
+        phase = 0.1*self.nacquisitions + 0.01*np.arange(nframes)[:, None, None]
+        freq = 2*np.arange(1, 5)[None, :, None]
+        wave = 60*np.sin(2*np.pi*freq*t + phase)
+        wave += rng.normal(0, 2, wave.shape)
+
+        self.frames = np.clip(np.round(wave), -128, 127).astype(np.int8)
+        self.codes = self.frames[-1]
+
+        # frames triggered one screen width apart
+        now = time.time() % 86400
+        self.frame_times = now + np.arange(nframes) * 10*self.tdiv
+        self.nacquisitions += 1
+
+    def _set_sequence(self, **settings):
+        for key, value in settings.items():
+            setattr(self, key, value)
+        self.acquire()
+
+    def _set_run(self, run):
+        self.run = run
+        if not run:
+            self.trig_armed = None
+
+    def _set_trig_mode(self, mode):
+        mode = mode.upper()
+        if mode.startswith('SING'):
+            self.trig_mode = 'SINGLE'
+            self._arm()
+        elif mode.startswith('NORM'):
+            self.trig_mode = 'NORMAL'
+        else:
+            self.trig_mode = 'AUTO'
+
+    def _arm(self):
+        self.run = True
+        self.trig_armed = time.monotonic()
+
+    def _trig_status(self):
+        if self.trig_armed is None:
+            return 'Stop' if not self.run else 'Auto'
+
+        if time.monotonic() - self.trig_armed >= self.trigger_period:
+            self.acquire()
+            self.trig_armed = None
+            if self.trig_mode == 'SINGLE':
+                self.run = False
+                return 'Stop'
+            return "Trig'd"
+        return 'Arm'
+
+    def _set_srate(self, rate):
+        self.npts = max(int(rate * 10 * self.tdiv), 1)
+        self.acquire()
+
+    def _set_probe(self, ch, value):
+        if value.upper().startswith('DEF'):
+            self.ch[ch]['probe'] = 1.0
+        else:
+            self.ch[ch]['probe'] = float(value.split()[-1])
+
+    # waveform transfer
+    def _transfer_points(self):
+        """Get indexes of points sent by WAV:DATA?"""
+        npts = self.wave_points if self.wave_points > 0 else self.npts
+        npts = min(npts, self.maxpoint)
+        return np.arange(self.wave_start, self.npts, self.wave_interval)[:npts]
+
+    def _transfer_frames(self):
+        """Get indexes of frames sent by WAV:DATA?, set by WAV:SEQuence"""
+        if not self.sequence:
+            return np.arange(1)
+
+        frame, start = self.wave_sequence
+        if frame > 0:
+            return np.array([frame-1])
+
+        nframes = max(self.maxpoint // len(self._transfer_points()), 1)
+        return np.arange(start-1, min(start-1+nframes, len(self.frames)))
+
+    def _history_time(self):
+        """Trigger time of the current history frame, as hh:mm:ss.ffffff"""
+        stamp = self.frame_times[self.history_frame-1]
+        hours, stamp = divmod(stamp, 3600)
+        minutes, seconds = divmod(stamp, 60)
+        return f'{int(hours):02d}:{int(minutes):02d}:{seconds:09.6f}'
+
+    def _wave_data(self):
+        """Get WAV:DATA? payload"""
+        frames = self.frames[self._transfer_frames(), self.wave_ch-1]
+        codes = frames[:, self._transfer_points()].ravel()
+
+        # word: adc code left-aligned in 16 bits
+        if self.wave_width == 'WORD':
+            return (codes.astype('<i2') << 8).tobytes()
+        return codes.tobytes()
+
+    def wavedesc(self):
+        """Build the 346 byte WAVEDESC block for the current waveform source
+
+        Returns:
+            bytes: descriptor
+        """
+        ch = self.ch[self.wave_ch]
+        width = 2 if self.wave_width == 'WORD' else 1
+        ntransfer = len(self._transfer_points())
+        nframes = len(self._transfer_frames())
+        code_per_div = self.CODE_PER_DIV
+        if self.adc_bit > 8:
+            code_per_div *= 2**4
+        tdiv_idx = int(np.argmin(np.abs(np.array(self.TDIV_ENUM) - self.tdiv)))
+        coupling = ('DC', 'AC', 'GND').index(ch['coupling'])
+
+        desc = bytearray(346)
+        struct.pack_into('<16s16shhi', desc, 0, b'WAVEDESC', b'WAVEACE', width-1, 0, 346)
+        struct.pack_into('<i', desc, 60, ntransfer*width*nframes)
+        struct.pack_into('<16s', desc, 76, b'Siglent SDS')
+        struct.pack_into('<i', desc, 116, self.npts)
+        struct.pack_into('<ii', desc, 132, self.wave_start, self.wave_interval)
+        struct.pack_into('<ii', desc, 144, nframes, len(self.frames))
+        struct.pack_into('<fff', desc, 156, ch['scale']/ch['probe'], ch['offset']/ch['probe'], code_per_div)
+        struct.pack_into('<hh', desc, 172, self.adc_bit, self.wave_sequence[0])
+        struct.pack_into('<fd', desc, 176, 10*self.tdiv/self.npts, self.delay)
+        struct.pack_into('<hhfhh', desc, 324, tdiv_idx, coupling, ch['probe'], 0, 0)
+        struct.pack_into('<h', desc, 344, self.wave_ch-1)
+        return bytes(desc)
+
+    @staticmethod
+    def _block(data):
+        """Format IEEE 488.2 definite-length block, terminated as by the SDS"""
+        return b'#9%09d' % len(data) + data + b'\n\n'
+
+    # measurements
+    def volts(self, ch, sequence=False):
+        """Get the current waveform of a channel in volts
+
+        Args:
+            ch (int): channel number
+            sequence (bool): if True, get all frames with shape (frame, npts)
+        """
+        codes = self.frames[:, ch-1] if sequence else self.codes[ch-1]
+        return codes / self.CODE_PER_DIV * self.ch[ch]['scale'] - self.ch[ch]['offset']
+
+    def measure_value(self, item, ch):
+        """Calculate simple measurement item on channel, nan if not emulated"""
+        v = self.volts(ch)
+        item = item.upper()
+
+        if item == 'PKPK':      return np.ptp(v)
+        elif item == 'MAX':     return np.max(v)
+        elif item == 'MIN':     return np.min(v)
+        elif item in ('MEAN', 'CMEAN'):   return np.mean(v)
+        elif item in ('STDEV', 'VSTD'):   return np.std(v)
+        elif item in ('RMS', 'CRMS'):     return np.sqrt(np.mean(v**2))
+        elif item in ('MEDIAN', 'CMEDIAN'): return np.median(v)
+        elif item == 'FREQ':    return 2*ch / (10*self.tdiv)
+        elif item == 'PER':     return 10*self.tdiv / (2*ch)
+        return np.nan
+
+    def _measure_str(self, item, ch):
+        if item.upper() == 'ALL':
+            return ','.join(f'{it},{self._measure_str(it, ch)}' for it in self.MEASURE_ALL)
+        val = self.measure_value(item, ch)
+        return '***' if np.isnan(val) else f'{val:E}'
+
+    def _set_simple_source(self, ch):
+        self.simple_source = ch
+        self.simple_changed = time.monotonic()
+
+    def _simple_value(self, item):
+        """MEAS:SIMP:VAL?, see measure_update"""
+        if self.measure_update is None or not self.run:
+            self.simple_measured = self.simple_source
+        else:
+            self.acquire()
+            if time.monotonic() - self.simple_changed >= self.measure_update:
+                self.simple_measured = self.simple_source
+        return self._measure_str(item, self.simple_measured)
+
+    def _adv_value(self, idx):
+        adv = self.adv[idx]
+        if not adv['state']:
+            return '***'
+        return self._measure_str(adv['type'], adv['source'][1])
+
+class EmulatedSPD3303(EmulatedDevice):
+    """Emulate the Siglent SPD3303X power supply
+
+        Each output drives a resistive load. Output current is limited by the
+        current setpoint.
+
+        Attributes:
+
+            load (float): load resistance on each channel in ohms
+    """
+
+    IDN = 'Siglent Technologies,SPD3303X,SPDEMULATOR00001,1.01.01.02.05,V3.0'
+
+    def __init__(self, load=10.0):
+        self.load = load
+        super().__init__()
+
+        onoff = lambda val: val.upper() in ('ON', '1')
+        chnum = lambda arg: int(arg.upper().lstrip('CH'))
+
+        self.add_commands({
+            'INST?':      lambda n, a: f'CH{self.ch}',
+            'INST':       lambda n, a: setattr(self, 'ch', chnum(a[0])),
+            'CH:VOLT':    lambda n, a: self.out[n[0]].__setitem__('volt', float(a[0])),
+            'CH:VOLT?':   lambda n, a: f"{self.out[n[0]]['volt']:.3f}",
+            'CH:CURR':    lambda n, a: self.out[n[0]].__setitem__('amp', float(a[0])),
+            'CH:CURR?':   lambda n, a: f"{self.out[n[0]]['amp']:.3f}",
+            'MEAS:VOLT?': lambda n, a: f'{self.measure(a, 0):.3f}',
+            'MEAS:CURR?': lambda n, a: f'{self.measure(a, 1):.3f}',
+            'MEAS:POWE?': lambda n, a: f'{self.measure(a, 2):.3f}',
+            'OUTP':       lambda n, a: self.out[chnum(a[0])].__setitem__('on', onoff(a[1])),
+            'OUTP:TRAC':  lambda n, a: setattr(self, 'track', int(a[0])),
+            'OUTP:WAV':   lambda n, a: self.out[chnum(a[0])].__setitem__('wave', onoff(a[1])),
+            'TIME':       lambda n, a: self.out[chnum(a[0])].__setitem__('timer', onoff(a[1])),
+            'TIME:SET':   lambda n, a: self.timer[chnum(a[0])].__setitem__(int(a[1]), tuple(float(v) for v in a[2:5])),
+            'TIME:SET?':  lambda n, a: '{:.3f},{:.3f},{:.3f}'.format(*self.timer[chnum(a[0])][int(a[1])]),
+            'SYST:STAT?': lambda n, a: f'0x{self.status():04X}',
+        })
+
+    def reset(self):
+        """Return device to default state"""
+        self.ch = 1
+        self.track = 0
+        self.out = {i: {'volt': 0.0, 'amp': 3.2, 'on': False, 'wave': False, 'timer': False}
+                    for i in range(1, 4)}
+        self.timer = {i: {g: (0.0, 0.0, 0.0) for g in range(1, 6)} for i in range(1, 4)}
+
+    def measure(self, args, idx):
+        """Get (voltage, current, power)[idx] of channel in args, or the current channel"""
+        ch = int(args[0].upper().lstrip('CH')) if args else self.ch
+        out = self.out[ch]
+
+        if not out['on']:
+            return 0.0
+
+        amp = min(out['volt'] / self.load, out['amp'])
+        volt = amp * self.load
+        return (volt, amp, volt*amp)[idx]
+
+    def is_cc(self, ch):
+        """True if channel is current limited"""
+        out = self.out[ch]
+        return out['on'] and out['volt'] / self.load > out['amp']
+
+    def status(self):
+        """SYST:STAT? register
+
+            bit 0: CH1 CV/CC, bit 1: CH2 CV/CC, bits 2-3: 01 independent,
+            10 series, 11 parallel, bit 4: CH1 on, bit 5: CH2 on, bit 6: timer 1,
+            bit 7: timer 2, bit 8: CH1 waveform display, bit 9: CH2 waveform display
+        """
+        track = {0: 0b01, 1: 0b10, 2: 0b11}[self.track]
+        return (int(self.is_cc(1))
+                | int(self.is_cc(2)) << 1
+                | track << 2
+                | int(self.out[1]['on']) << 4
+                | int(self.out[2]['on']) << 5
+                | int(self.out[1]['timer']) << 6
+                | int(self.out[2]['timer']) << 7
+                | int(self.out[1]['wave']) << 8
+                | int(self.out[2]['wave']) << 9)
+
+class EmulatedDG1032Z(EmulatedDevice):
+    """Emulate the RIGOL DG1032Z arbitrary waveform generator
+
+        Attributes:
+
+            arb (dict): uploaded DAC16 codes for each channel (np.ndarray)
+    """
+
+    IDN = 'Rigol Technologies,DG1032Z,DGEMULATOR00001,00.01.14'
+
+    def __init__(self):
+        super().__init__()
+
+        onoff = lambda val: 'ON' if val else 'OFF'
+        tobool = lambda val: val.upper() in ('ON', '1')
+
+        self.add_commands({
+            'OUTP:STAT?':  lambda n, a: onoff(self.src[n[0]]['output']),
+            'OUTP:STAT':   lambda n, a: self.src[n[0]].__setitem__('output', tobool(a[0])),
+            'SOUR:FREQ?':  lambda n, a: f"{self.src[n[0]]['freq']:E}",
+            'SOUR:FREQ':   lambda n, a: self.src[n[0]].__setitem__('freq', float(a[0])),
+            'SOUR:VOLT?':  lambda n, a: f"{self.src[n[0]]['vpp']:E}",
+            'SOUR:VOLT':   lambda n, a: self.src[n[0]].__setitem__('vpp', float(a[0])),
+            'SOUR:VOLT:OFFS?': lambda n, a: f"{self.src[n[0]]['offset']:E}",
+            'SOUR:VOLT:OFFS':  lambda n, a: self.src[n[0]].__setitem__('offset', float(a[0])),
+            'SOUR:PHAS?':  lambda n, a: f"{self.src[n[0]]['phase']:E}",
+            'SOUR:PHAS':   lambda n, a: self.src[n[0]].__setitem__('phase', float(a[0])),
+            'SOUR:APPL?':  lambda n, a: self._apply_str(n[0]),
+            'SOUR:FUNC':   lambda n, a: self.src[n[0]].__setitem__('func', a[0].upper()),
+            'SOUR:FUNC:ARB:MODE': lambda n, a: self.src[n[0]].__setitem__('arb_mode', a[0].upper()),
+            'SOUR:FUNC:ARB:SRAT': lambda n, a: self.src[n[0]].__setitem__('srate', float(a[0])),
+            'SOUR:AM:STAT?': lambda n, a: onoff(self.src[n[0]]['am']),
+            'SOUR:AM:STAT':  lambda n, a: self.src[n[0]].__setitem__('am', tobool(a[0])),
+            'SOUR:AM:SOUR':  lambda n, a: None,
+            'SOUR:AM:INT:FUNC': lambda n, a: None,
+            'SOUR:AM:INT:FREQ': lambda n, a: None,
+            'SOUR:AM':       lambda n, a: None,
+            'SOUR:DATA:DAC': self._dac16,
+        })
+
+        for fn in ('SIN', 'SQU', 'RAMP', 'PULS', 'NOIS', 'USER', 'DC'):
+            self.add_commands({f'SOUR:APPL:{fn}': self._make_apply(fn)})
+
+    def reset(self):
+        """Return device to default state"""
+        self.src = {i: {'output': False, 'func': 'SIN', 'freq': 1e3, 'vpp': 5.0,
+                        'offset': 0.0, 'phase': 0.0, 'am': False, 'arb_mode': 'FREQ',
+                        'srate': 1e6}
+                    for i in (1, 2)}
+        self.arb = {1: np.zeros(0, dtype='<u2'), 2: np.zeros(0, dtype='<u2')}
+        self._arb_partial = {1: [], 2: []}
+        self.nuploads = 0
+
+    def _make_apply(self, fn):
+        def apply(nums, args):
+            src = self.src[nums[0]]
+            src['func'] = fn
+            for key, val in zip(('freq', 'vpp', 'offset', 'phase'), args):
+                src[key] = float(val)
+        return apply
+
+    def _apply_str(self, ch):
+        src = self.src[ch]
+        return f'"{src["func"]},{src["freq"]:E},{src["vpp"]:E},{src["offset"]:E},{src["phase"]:E}"'
+
+    def _dac16(self, nums, args):
+        """SOURn:DATA:DAC16 VOLATILE,CON|END,#<block>"""
+        ch = nums[0]
+        block = args[-1]
+        ndigits = int(block[1:2])
+        data = np.frombuffer(block[2+ndigits:], dtype='<u2')
+        self._arb_partial[ch].append(data)
+
+        if args[1].upper() == 'END':
+            self.arb[ch] = np.concatenate(self._arb_partial[ch])
+            self._arb_partial[ch] = []
+            self.nuploads += 1
+
+class Emulator(object):
+    """Serve an emulated device over a raw TCP socket
+
+        Attributes:
+
+            DEVICES (dict): emulated device classes keyed by device name
+            device (EmulatedDevice): emulated device state
+            latency (float): seconds to wait before each response
+            bandwidth (float|None): maximum bytes/s sent to the client, None for no limit
+            host (str): address of server
+            port (int): port of server
+            nmessages (int): number of commands handled
+    """
+
+    DEVICES = {'SDS5034': EmulatedSDS5034,
+               'SPD3303': EmulatedSPD3303,
+               'DG1032Z': EmulatedDG1032Z,
+              }
+
+    def __init__(self, device='SDS5034', host='127.0.0.1', port=0, latency=0,
+                 bandwidth=None, **device_kwargs):
+        """Init. Start serving immediately in a background thread.
+
+        Args:
+            device (str): SDS5034|SPD3303|DG1032Z
+            host (str): address to bind to
+            port (int): port to bind to, 0 to pick a free port
+            latency (float): seconds to wait before each response
+            bandwidth (float|None): maximum bytes/s sent to the client, None for no limit
+            device_kwargs: passed to the emulated device class
+        """
+        if device not in self.DEVICES:
+            raise RuntimeError(f'device must be one of {tuple(self.DEVICES)}, not "{device}"')
+
+        self.device = self.DEVICES[device](**device_kwargs)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.nmessages = 0
+
+        self._server = socket.create_server((host, port))
+        self.host, self.port = self._server.getsockname()[:2]
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Stop serving"""
+        try:
+            self._server.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._server.close()
+
+    def serve_forever(self):
+        """Block until interrupted"""
+        try:
+            while self._thread.is_alive():
+                self._thread.join(1)
+        except KeyboardInterrupt:
+            self.close()
+
+    def _serve(self):
+        """Accept connections"""
+        while True:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self._handle_connection, args=(conn,), daemon=True).start()
+
+    def _handle_connection(self, conn):
+        """Read commands from connection and respond until closed"""
+        buffer = bytearray()
+        with conn:
+            while True:
+                try:
+                    data = conn.recv(1024*1024)
+                except OSError:
+                    return
+                if not data:
+                    return
+                buffer += data
+
+                # handle complete program messages
+                for commands in self._split_messages(buffer):
+                    responses = []
+                    for command in commands:
+                        self.nmessages += 1
+                        response = self.device.handle(command)
+                        if response is not None:
+                            responses.append(response)
+
+                    if responses:
+                        try:
+                            self._send(conn, self._join(responses))
+                        except OSError:
+                            return
+
+    @staticmethod
+    def _join(responses):
+        """Join responses to a compound query"""
+        if len(responses) == 1 and isinstance(responses[0], bytes):
+            return responses[0]
+        return b';'.join(r if isinstance(r, bytes) else r.encode('ascii') for r in responses) + b'\n'
+
+    @staticmethod
+    def _split_messages(buffer):
+        """Pop complete program messages from the buffer
+
+            A program message is terminated by a newline, or by the end of a
+            definite length block argument. Commands within the message are
+            separated by ";".
+
+        Args:
+            buffer (bytearray): received bytes, complete messages are removed
+
+        Returns:
+            list: list of program messages, each a list of commands (bytes)
+        """
+        messages = []
+        commands = []
+        msg_start = 0
+        start = 0
+        i = 0
+        in_args = False
+
+        while i < len(buffer):
+            c = buffer[i]
+
+            # definite length block: skip data, and end the message
+            if c == ord('#') and in_args and i+1 < len(buffer) and 0x31 <= buffer[i+1] <= 0x39:
+                ndigits = buffer[i+1] - 0x30
+                if i + 2 + ndigits > len(buffer):
+                    break
+                end = i + 2 + ndigits + int(buffer[i+2:i+2+ndigits])
+                if end > len(buffer):
+                    break
+                commands.append(bytes(buffer[start:end]))
+                messages.append(commands)
+                commands = []
+                if end < len(buffer) and buffer[end] in b'\n;':
+                    end += 1
+                msg_start = start = i = end
+                in_args = False
+                continue
+
+            if c == ord(' '):
+                in_args = True
+
+            elif c in b';\n':
+                commands.append(bytes(buffer[start:i]))
+                if c == ord('\n'):
+                    messages.append(commands)
+                    commands = []
+                    msg_start = i + 1
+                start = i + 1
+                in_args = False
+
+            i += 1
+
+        # incomplete message is parsed again once the rest arrives
+        del buffer[:msg_start]
+
+        return messages
+
+    def _send(self, conn, data):
+        """Send response after latency, limited to bandwidth"""
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if not self.bandwidth:
+            conn.sendall(data)
+            return
+
+        view = memoryview(data)
+        chunk = 64*1024
+        t0 = time.monotonic()
+        for i in range(0, len(view), chunk):
+            conn.sendall(view[i:i+chunk])
+            wait = t0 + (i+chunk)/self.bandwidth - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Serve an emulated device over a raw TCP socket')
+    parser.add_argument('device', choices=tuple(Emulator.DEVICES))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5025)
+    parser.add_argument('--latency', type=float, default=0, help='seconds before each response')
+    parser.add_argument('--bandwidth', type=float, default=None, help='bytes/s sent to client')
+    args = parser.parse_args()
+
+    emu = Emulator(args.device, host=args.host, port=args.port, latency=args.latency,
+                   bandwidth=args.bandwidth)
+    print(f'Serving {args.device} on {emu.host}:{emu.port}')
+    emu.serve_forever()
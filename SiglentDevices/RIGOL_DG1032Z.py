@@ -14,12 +14,18 @@
 
 from . import SiglentBase
 import numpy as np
+import hashlib, os
 
 class DG1032Z(SiglentBase):
     """Control RIGOL function generator
 
         Attributes:
             block_until_finished (bool): if true, block set operations until finished
+            arb_hash (dict): hash of the DAC16 codes last uploaded to each channel by
+                set_wave_custom, such that the same waveform is not uploaded again
+            arb_cache_dir (str|None): if not None, directory in which set_wave_custom
+                keeps the DAC16 codes of each waveform, such that they are not
+                calculated again
 
     """
 
@@ -57,17 +63,67 @@ class DG1032Z(SiglentBase):
                  'SRC', 'IGNITION', 'NIMHDISCHARGE', 'GATEVIBR',
                  'SIN', 'SQU', 'RAMP', 'PULS', 'NOIS', 'HARM', 'CUST', )
 
-    def __init__(self, hostname='tucan-awg01.triumf.ca'):
+    def __init__(self, hostname='tucan-awg01.triumf.ca', transport='vxi11', port=None):
         """Init.
 
         Args:
             hostname (str): address of device (DNS or IP)
+            transport (str): vxi11|socket, see SiglentBase
+            port (int|None): port for socket transport
         """
-        super().__init__(hostname=hostname)
+        super().__init__(hostname=hostname, transport=transport, port=port)
 
         # setup block set values
         self.block_until_finished = True
 
+        # uploaded arbitrary waveforms
+        self.arb_hash = {}
+        self.arb_cache_dir = None
+
+    def _encode_arb(self, voltages):
+        """Center and normalize voltages, and convert to DAC16 codes
+
+            If arb_cache_dir is set, the result is saved there, keyed by a hash
+            of the voltages, and read back instead of calculated next time.
+
+        Args:
+            voltages (np.ndarray): voltages, float64
+
+        Returns:
+            tuple: (codes, offset, vpp)
+                codes (np.ndarray): DAC16 codes, little endian uint16
+                offset (float): offset in volts which counteracts normalization
+                vpp (float): peak-peak voltage in volts which counteracts normalization
+        """
+
+        # check cache
+        path = None
+        if self.arb_cache_dir is not None:
+            key = hashlib.sha1(voltages.tobytes()).hexdigest()
+            path = os.path.join(self.arb_cache_dir, f'{key}.npz')
+            if os.path.exists(path):
+                with np.load(path) as data:
+                    return (data['codes'], float(data['offset']), float(data['vpp']))
+
+        # center and normalize voltages
+        offset = np.mean(voltages)
+        voltages = voltages - offset
+        maxv = max(voltages)
+        minv = min(voltages)
+
+        norm = max(abs(maxv), abs(minv))
+        vpp = abs(maxv-minv)
+        voltages = voltages / norm
+
+        # convert to codes
+        codes = (voltages * 8191.5 + 8191.5).astype('<H')
+
+        if path is not None:
+            os.makedirs(self.arb_cache_dir, exist_ok=True)
+            np.savez(path, codes=codes, offset=offset, vpp=vpp)
+
+        return (codes, offset, vpp)
+
     def get_ch_state(self, ch=1):
         """Get channel on/off state
 
@@ -180,6 +236,11 @@ class DG1032Z(SiglentBase):
 
         return self.query(f'SOUR{ch}:VOLT?')
 
+    def refresh(self):
+        """Clear the settings cache and the record of uploaded waveforms (arb_hash)"""
+        super().refresh()
+        self.arb_hash.clear()
+
     def set_ch_state(self, ch=1, state=False):
         """Turn channel on/off
 
@@ -324,58 +385,72 @@ class DG1032Z(SiglentBase):
         else:
             mode = waveform
 
-        # set waveform
+        # set waveform, the uploaded custom waveform is no longer in use
+        self.arb_hash.pop(ch, None)
         self.write(f'SOUR{ch}:APPL:{mode} {freq},{vpp},{offset},{phase}')
 
-    def set_wave_custom(self, ch, voltages, period):
+    def set_wave_custom(self, ch, voltages, period, force=False):
         """Send a custom waveform to the AWG
 
         See this article for details:
 
         https://rigol.my.site.com/support/s/article/methods-for-programmatically-creating-arbitrary-waves1
 
+        If the waveform is the same as the last one uploaded to the channel (see
+        arb_hash), only the offset, amplitude and sample rate are set.
+
         Args:
             ch (int): channel number, 1|2
             voltages (iterable): list of voltages to set
             period (float): duration of voltage sequence, assuming equally spaced points.
+            force (bool): if True, upload the waveform even if it is already on the device
         """
 
         # data type
-        voltages = np.array(voltages)
+        voltages = np.ascontiguousarray(voltages, dtype=float)
 
-        # get length and point spacing
+        # get length and sample rate
         npts = len(voltages)
-        dt = npts/period
+        srate = npts/period
 
-        # center and normalize voltages
-        offset = np.mean(voltages)
-        voltages -= offset
-        maxv = max(voltages)
-        minv = min(voltages)
-
-        norm = max(abs(maxv), abs(minv))
-        vpp = abs(maxv-minv)
-        voltages = voltages / norm
+        # center, normalize and convert to codes
+        codes, offset, vpp = self._encode_arb(voltages)
 
         # set amp values to counteract normalization
         self.set_offset(ch, offset)
         self.set_vpp(ch, vpp)
 
+        # send data unless already there
+        digest = hashlib.sha1(codes.tobytes()).hexdigest()
+        if force or self.arb_hash.get(ch, None) != digest:
+            self.arb_hash.pop(ch, None)
+            self._send_arb(ch, codes)
+            self.arb_hash[ch] = digest
+
+        # set arb in srate mode
+        self.write(f'SOURCE{ch}:FUNCTION:ARB:MODE SRATE')
+
+        # set readback rate
+        self.write(f'SOURCE{ch}:FUNCTION:ARB:SRATE {srate:E}')
+
+    def _send_arb(self, ch, codes):
+        """Upload DAC16 codes to volatile memory, in groups of at most ARB_MAX_SEND points
+
+        Args:
+            ch (int): channel number, 1|2
+            codes (np.ndarray): DAC16 codes, little endian uint16
+        """
+
         # make sure data is sent in small enough groups
-        npartitions = int(np.ceil(npts / self.ARB_MAX_SEND))
-        volts_send = np.array_split(voltages, npartitions)
+        npartitions = int(np.ceil(len(codes) / self.ARB_MAX_SEND))
+        codes_send = np.array_split(codes, npartitions)
 
         # send data in groups
         for i in range(npartitions):
 
             # get data to send
-            volts = volts_send[i]
-            npts = len(volts)
-
-            # convert voltages to bytes
-            volts = volts * 8191.5 + 8191.5
-            volts = volts.astype('<H')
-            volts = volts.tobytes()
+            data = codes_send[i].tobytes()
+            npts = len(codes_send[i])
 
             # make header line
             nchar = len(str(npts*2))
@@ -387,13 +462,7 @@ class DG1032Z(SiglentBase):
             header = f'SOUR{ch}:DATA:DAC16 VOLATILE,{flag},#{nchar}{npts*2}'
 
             # write voltages to out
-            self.write_raw(bytes(header, 'ascii') + volts)
-
-        # set arb in srate mode
-        self.write(f'SOURCE{ch}:FUNCTION:ARB:MODE SRATE')
-
-        # set readback rate
-        self.write(f'SOURCE{ch}:FUNCTION:ARB:SRATE {dt:E}')
+            self.write_raw(bytes(header, 'ascii') + data)
 
     def wait(self):
         """Wait until operation has completed. Block operation until completed"""
@@ -404,7 +473,8 @@ class DG1032Z(SiglentBase):
 
         Args:
             block (bool, None): if true, block output until write is finished.
-                if None, use self.block_until_finshed as default condition
+                if None, use self.block_until_finshed as default condition.
+                Ignored when batching, see SiglentBase.batch
 
             remaining arguments passed to SiglentBase.write
         """
@@ -413,6 +483,6 @@ class DG1032Z(SiglentBase):
         if block is None:
             block = self.block_until_finished
 
-        if block:
+        if block and not self.batching:
             self.wait()
 
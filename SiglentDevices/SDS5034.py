@@ -8,10 +8,13 @@
 """
 
 from . import SiglentBase
+from .Waveform import Waveform
+from .WaveformStore import LatestStore
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
-import struct, math, time
+import struct, math, time, threading, queue
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
 
 class SDS5034(SiglentBase):
@@ -22,11 +25,26 @@ class SDS5034(SiglentBase):
             HORI_NUM (int): Number of horizontal divisions
             MEASURE_ADV_MODE1_MAX (int): Number of advanced measurements allowable for mode 1
             preambles (dict): preamble values, saved when measured
-            sds (pyvisa resource): allows write/read/query to the device
+            sds (pyvisa resource|SocketTransport): allows write/read/query to the device
+            WAVEDESC (struct.Struct): binary layout of the waveform preamble
+            WAVEDESC_FIELDS (tuple): preamble keys in the order of WAVEDESC
             TDIV_ENUM (list): time division values from table 2 of https://siglentna.com/wp-content/uploads/dlm_uploads/2022/07/SDS_ProgrammingGuide_EN11C-2.pdf (page 559)
-            waveforms (pd.DataFrame): waveform data in volts (includes all channels)
+            store (WaveformStore): keeps the waveforms read. LatestStore (default) keeps the
+                last waveform of each channel, RingStore the last N, WaveformStore none
+            waveforms (pd.DataFrame): last waveform of each channel in volts, from store
             MEASUREMENT_ITEMS (list): things which can be read as simple measurements from the scope
+            MEASUREMENT_INDEX (dict): MEASUREMENT_ITEMS keyed by lower case name
+            MEASURE_ADV_DTYPE (np.dtype): record of an advanced measurement item, see get_measure_adv_all
             block_until_finished (bool): if true, block set operations until finished
+            stream_stats (dict): statistics of the last stream_acquisitions
+            settle_timeout (float): seconds to wait for measurement settings to take effect
+            settle_poll (float): first wait between polls while settling, doubled each poll
+            settle_time (float): seconds taken by the last settle
+            settle_run (float): seconds to wait after changing the simple measurement
+                source while running. The scope has no acquisition counter to poll, so
+                with 0 (default) the first value read may be from an acquisition of the
+                previous source. Set to at least one acquisition period to avoid this,
+                at the cost of this wait on every change of source
     """
 
     # global variables
@@ -78,6 +96,29 @@ class SDS5034(SiglentBase):
                     1000,
                 )
 
+    # WAVEDESC waveform preamble layout, little endian. See page 560 of manual.
+    # Fields in order of WAVEDESC_FIELDS, "x" are unused bytes
+    WAVEDESC = struct.Struct('<'
+                             '16s16s'   # 0   descriptor, template
+                             'hhi'      # 32  comm_type, comm_order, wave_desc_length
+                             '20xi12x'  # 60  wave_array_1
+                             '16s24x'   # 76  instrument name
+                             'i12x'     # 116 wave_array_count
+                             'ii4x'     # 132 first_point, data_interval
+                             'ii4x'     # 144 read_frames, sum_frames
+                             'fff4x'    # 156 vertical gain, vertical offset, code_per_div
+                             'hh'       # 172 adc_bit, frame_index
+                             'fd136x'   # 176 horizontal interval, horizontal offset
+                             'hhfhh8x'  # 324 timebase, coupling, probe, fixed gain, bandwidth
+                             'h'        # 344 wave source
+                            )
+    WAVEDESC_FIELDS = ('descriptor', 'template', 'comm_type', 'comm_order',
+                       'wave_desc_bytes', 'data_bytes', 'instrum_name', 'data_npts',
+                       'data_first_pt', 'data_interval', 'read_frames', 'sum_frames',
+                       'v_per_div_raw', 'v_offset_raw', 'code_per_div', 'adc_bit',
+                       'frame_index', 'sample_interval', 't_delay_s', 't_per_div',
+                       'coupling', 'probe_atten', 'fixed_v_gain', 'bandwidth', 'channel')
+
     MEASUREMENT_ITEMS = ['PKPK','MAX','MIN','AMPL','TOP','BASE','LEVELX','CMEAN',
                                      'MEAN','STDEV','VSTD','RMS','CRMS','MEDIAN','CMEDIAN',
                                      'OVSN','FPRE','OVSP','RPRE','PER','FREQ','TMAX','TMIN',
@@ -86,27 +127,72 @@ class SDS5034(SiglentBase):
                                      'AREA','ABSAREA','CYCLES','REDGES','FEDGES','EDGES',
                                      'PPULSES','NPULSES','PACArea','NACArea','ACArea',
                                      'ABSACArea']
+    MEASUREMENT_INDEX = {item.lower(): item for item in MEASUREMENT_ITEMS}
+
+    MEASURE_ADV_DTYPE = np.dtype([('idx', 'i1'),
+                                  ('state', '?'),
+                                  ('type', 'U16'),
+                                  ('source', 'U8'),
+                                  ('value', 'f8')])
 
-    def __init__(self, hostname='tucan-scope1.triumf.ca'):
+    def __init__(self, hostname='tucan-scope1.triumf.ca', transport='vxi11', port=None):
         """ Init.
 
         Args:
             hostname (str): ip address or DNC lookup of device
+            transport (str): vxi11|socket, see SiglentBase
+            port (int|None): port for socket transport
         """
 
         # setup
-        super().__init__(hostname=hostname)
+        super().__init__(hostname=hostname, transport=transport, port=port)
 
         # set chunk size for communication
         self.sds.chunk_size = 20*1024*1024
 
         # set data storage
         self.preambles = {}
-        self.waveforms = pd.DataFrame()
+        self.store = LatestStore()
 
         # setup block set values
         self.block_until_finished = True
 
+        self.stream_stats = {}
+
+        # settle after changes to measurement settings, see _settle
+        self.settle_timeout = 2.0
+        self.settle_poll = 1e-3
+        self.settle_time = 0
+        self.settle_run = 0
+
+    @property
+    def waveforms(self):
+        """pd.DataFrame: last waveform of each channel in volts, from self.store"""
+        return self.store.to_frame()
+
+    @waveforms.setter
+    def waveforms(self, waves):
+        """Replace the waveforms in self.store
+
+        Args:
+            waves (dict|list|None): Waveform objects to store, in a dict (keyed
+                by anything) or list. Empty (e.g. {} or pd.DataFrame()) or None
+                to clear the store.
+        """
+        if isinstance(waves, dict):
+            waves = list(waves.values())
+        elif waves is None or (isinstance(waves, pd.DataFrame) and waves.empty):
+            waves = []
+
+        waves = list(waves)
+        for wave in waves:
+            if not isinstance(wave, Waveform):
+                raise RuntimeError(f'waveforms must be Waveform objects, not {type(wave).__name__}')
+
+        self.store.clear()
+        for wave in waves:
+            self.store.put(wave)
+
     def _check_measure_mode(self, target_mode):
         """Check that the measurement state is correct
 
@@ -117,29 +203,95 @@ class SDS5034(SiglentBase):
         # check measurment state
         if not self.get_measure_state():
             self.set_measure_state(True)
-            time.sleep(0.5)
+            self._settle_query('MEAS?', 'ON')
 
         # check mode
         if target_mode == 'advanced':
             if self.get_measure_mode(return_is_simple=True):
                 self.set_measure_mode('advanced')
-                time.sleep(0.5)
-                print('Set measurement mode simple to advanced')
+                self._settle_query('MEASure:MODE?', 'advanced')
+                print(f'Set measurement mode simple to advanced ({self.settle_time*1e3:.0f} ms)')
         else:
-            if self.get_measure_mode(return_is_simple=True):
+            if not self.get_measure_mode(return_is_simple=True):
                 self.set_measure_mode('simple')
-                time.sleep(0.5)
-                print('Set measurement mode advanced to simple')
+                self._settle_query('MEASure:MODE?', 'simple')
+                print(f'Set measurement mode advanced to simple ({self.settle_time*1e3:.0f} ms)')
+
+    def _settle(self, is_settled, timeout=None):
+        """Poll until the device has settled, with exponential backoff
+
+            The first poll is immediate, as writes already wait on *OPC? (see
+            block_until_finished). The wait between polls starts at settle_poll
+            and doubles up to 0.1 s. The time taken is kept in settle_time.
+
+        Args:
+            is_settled (function): called without arguments, returns True if settled
+            timeout (float|None): give up after this many seconds, if None use settle_timeout
+
+        Returns:
+            bool: True if settled, False if timed out
+        """
+        if timeout is None:
+            timeout = self.settle_timeout
+
+        wait = self.settle_poll
+        t0 = time.perf_counter()
+        settled = is_settled()
+
+        while not settled and time.perf_counter() - t0 < timeout:
+            time.sleep(wait)
+            wait = min(2*wait, 0.1)
+            settled = is_settled()
+
+        self.settle_time = time.perf_counter() - t0
+        return settled
+
+    def _settle_query(self, message, expected):
+        """Poll query until it returns the expected value, case insensitive
+
+        Args:
+            message (str): query
+            expected (str): expected response
+        """
+        if not self._settle(lambda: self.query(message).lower() == expected.lower()):
+            raise RuntimeError(f'{message} did not return {expected} within {self.settle_time:.2f} s')
+
+    def _measurement_item(self, item):
+        """Get measurement item as in MEASUREMENT_ITEMS, case insensitive
+
+        Args:
+            item (str): measurement item
+
+        Returns:
+            str: item as in MEASUREMENT_ITEMS
+        """
+        try:
+            return self.MEASUREMENT_INDEX[item.lower()]
+        except KeyError:
+            raise RuntimeError(f'Item not in list: {self.MEASUREMENT_ITEMS}') from None
+
+    def _invalidate_preamble(self, ch=None):
+        """Remove cached waveform preambles
+
+        Args:
+            ch (int|None): channel number. If None, remove preambles of all channels
+        """
+        keys = [key for key in self._settings if isinstance(key, tuple) and key[0] == 'WAV:PRE'
+                                                 and (ch is None or key[1] == int(ch))]
+        if keys:
+            self._invalidate(*keys)
 
     # simple basic commands
     def default(self):
         """Resets the oscilloscope to the default configuration, equivalent to the Default button on the front panel.
         """
         self.write('*RST')
+        self.refresh()
 
     def reboot(self):
         """Restart the scope."""
         self.write('SYSTem:REBoot')
+        self.refresh()
 
     def run(self):
         """Start taking data, equivalent to pressing the Run button on the front panel."""
@@ -158,7 +310,8 @@ class SDS5034(SiglentBase):
 
         Args:
             block (bool, None): if true, block output until write is finished.
-                if None, use self.block_until_finshed as default condition
+                if None, use self.block_until_finshed as default condition.
+                Ignored when batching, see SiglentBase.batch
 
             remaining arguments passed to SiglentBase.write
         """
@@ -167,15 +320,16 @@ class SDS5034(SiglentBase):
         if block is None:
             block = self.block_until_finished
 
-        if block:
-                self.wait()
+        if block and not self.batching:
+            self.wait()
 
     # simple queries
     def get_adc_resolution(self):
         """Returns:
             int: number of bits 8|10
         """
-        return int(self.query('ACQuire:RESolution?').replace('Bits', ''))
+        return self._get_cached('ACQ:RES',
+                    lambda: int(self.query('ACQuire:RESolution?').replace('Bits', '')))
 
     def get_ch_coupling(self, ch):
         """Args:
@@ -210,7 +364,8 @@ class SDS5034(SiglentBase):
             Returns:
                 float: Offset in volts
         """
-        return float(self.query(f'CHANnel{int(ch)}:OFFS?').strip())
+        return self._get_cached(f'CHAN{int(ch)}:OFFS',
+                    lambda: float(self.query(f'CHANnel{int(ch)}:OFFS?').strip()))
 
     def get_ch_probe(self, ch):
         """Args:
@@ -219,7 +374,8 @@ class SDS5034(SiglentBase):
             Returns:
                 float: probe attenuation factor
         """
-        return float(self.query(f'CHANnel{int(ch)}:PROBe?').strip())
+        return self._get_cached(f'CHAN{int(ch)}:PROB',
+                    lambda: float(self.query(f'CHANnel{int(ch)}:PROBe?').strip()))
 
     def get_ch_scale(self, ch):
         """
@@ -231,7 +387,8 @@ class SDS5034(SiglentBase):
             Returns:
                 float: vertical sensitivity in volts/div
         """
-        return float(self.query(f'CHANnel{int(ch)}:SCALe?').strip())
+        return self._get_cached(f'CHAN{int(ch)}:SCAL',
+                    lambda: float(self.query(f'CHANnel{int(ch)}:SCALe?').strip()))
 
     def get_ch_state(self, ch):
         """Args:
@@ -240,9 +397,30 @@ class SDS5034(SiglentBase):
             Returns:
                 bool: True if channel is on. False if channel is off
         """
-        state = self.query(f'CHANnel{int(ch)}:SWITch?')
+        return self._get_cached(f'CHAN{int(ch)}:SWIT',
+                    lambda: self.query(f'CHANnel{int(ch)}:SWITch?').strip().upper() == 'ON')
+
+    def get_ch_states(self, channels=(1, 2, 3, 4)):
+        """Get the on/off state of several channels with a single query
+
+        Args:
+            channels (iterable): channel numbers
+
+        Returns:
+            list: True if channel is on, False if off, for each channel
+        """
+        channels = [int(ch) for ch in channels]
+        keys = [f'CHAN{ch}:SWIT' for ch in channels]
 
-        return state.strip().upper() == 'ON'
+        if self.cache_settings and all(key in self._settings for key in keys):
+            return [self._settings[key] for key in keys]
+
+        responses = self.query_many([f'CHANnel{ch}:SWITch?' for ch in channels])
+        states = [response.strip().upper() == 'ON' for response in responses]
+
+        if self.cache_settings:
+            self._settings.update(zip(keys, states))
+        return states
 
     def get_ch_unit(self, ch):
         """Args:
@@ -269,13 +447,50 @@ class SDS5034(SiglentBase):
             bool if return_is_simple else string simple|advanced
         """
 
-        val = self.query('MEASure:MODE?')
-        val = val.lower()
+        val = self._get_cached('MEAS:MODE', lambda: self.query('MEASure:MODE?').lower())
         if  return_is_simple:
             return val == 'simple'
         else:
             return val
 
+    def get_measure_adv_all(self, active_only=True):
+        """Get state, type, source and value of all advanced measurement items in a single query
+
+        Args:
+            active_only (bool): if True, only return items which are on
+
+        Returns:
+            np.recarray: one record per item with fields (see MEASURE_ADV_DTYPE)
+                idx:    index of item [1-12]
+                state:  True if item is on
+                type:   measurement type, lower case
+                source: first source, ex: C1
+                value:  measured value, nan if not available (***)
+        """
+        self._check_measure_mode('advanced')
+
+        messages = []
+        for idx in range(1, 13):
+            messages.extend((f'MEAS:ADV:P{idx}?',
+                             f'MEAS:ADV:P{idx}:TYPE?',
+                             f'MEAS:ADV:P{idx}:SOURce1?',
+                             f'MEAS:ADV:P{idx}:VAL?'))
+        responses = [r.strip() for r in self.query_many(messages)]
+
+        records = []
+        for idx in range(1, 13):
+            state, item, source, value = responses[4*(idx-1):4*idx]
+            try:
+                value = float(value)
+            except ValueError:
+                value = np.nan
+            records.append((idx, state == 'ON', item.lower(), source, value))
+
+        meas = np.rec.array(records, dtype=self.MEASURE_ADV_DTYPE)
+        if active_only:
+            meas = meas[meas.state]
+        return meas
+
     def get_measure_adv_item(self, idx):
         """Get advanced measurement type
 
@@ -356,9 +571,8 @@ class SDS5034(SiglentBase):
         """
         self._check_measure_mode('simple')
 
-        val = self.query(f'MEAS:SIMP:SOURce?')
-
-        return int(val[-1])
+        return self._get_cached('MEAS:SIMP:SOUR',
+                    lambda: int(self.query(f'MEAS:SIMP:SOURce?')[-1]))
 
     def get_measure_simple_value(self, item, ch=None):
         """Get specified measurement value. Items do not need to be displayed  to be read out.
@@ -371,58 +585,90 @@ class SDS5034(SiglentBase):
                         |FALL80T20|CCJ|PAREA|NAREA|AREA|ABSAREA|CYCLES|
                         REDGES|FEDGES|EDGES|PPULSES|NPULSES|PACArea|
                         NACArea|ACArea|ABSACArea
-            ch (int|None): if None, measure current channel source, if int, check channel"""
+            ch (int|None): if None, measure current channel source, if int, check channel.
+                While running, see settle_run for changes of source
+
+        Returns:
+            float|dict: value of item. If item is ALL, dict of all MEASUREMENT_ITEMS,
+                see get_measure_simple_all
+        """
+
+        # check for changes made at the scope
+        if self.cache_settings:
+            self.check_front_panel()
 
         self._check_measure_mode('simple')
 
         # check item from list
-        list_lower = [par.lower() for par in self.MEASUREMENT_ITEMS]
-        item = item.lower()
-        if item not in list_lower:
-            raise RuntimeError(f'Item not in list: {self.MEASUREMENT_ITEMS}')
-        idx = list_lower.index(item)
-        par = self.MEASUREMENT_ITEMS[idx]
+        par = 'ALL' if item.lower() == 'all' else self._measurement_item(item)
 
         # check channel
         if ch is not None:
             ch_actual = self.get_measure_simple_source()
             if ch != ch_actual:
 
-                run_state = self.get_run_state()
-
-                # get current value, make sure it changes before reporting something
-                if not run_state:
-                    old_val = np.around(float(self.get_measure_simple_value(item, None)), 4)
-
-                # switch channels
+                # switch channels, wait until the scope reports the new source
                 self.set_measure_simple_source(ch)
-                print(f'Set simple measurment source to C{ch}')
+                self._settle_query('MEAS:SIMP:SOURce?', f'C{ch}')
 
-                # wait
-                if run_state:
-                    time.sleep(0.5)
-                else:
-                    val = float(self.query(f'MEAS:SIMP:VAL? {par}'))
+                # running: the value is only updated by later acquisitions,
+                # and there is no counter to wait on, see settle_run
+                if self.settle_run > 0 and self.get_run_state():
+                    time.sleep(self.settle_run)
+                    self.settle_time += self.settle_run
 
-                    while old_val == np.around(val, 4):
-                        time.sleep(0.1)
-                        val = float(self.query(f'MEAS:SIMP:VAL? {par}'))
+                print(f'Set simple measurment source to C{ch} ({self.settle_time*1e3:.0f} ms)')
 
         # get value
         val = self.query(f'MEAS:SIMP:VAL? {par}')
+
+        if par == 'ALL':
+            return self._parse_simple_all(val)
+
         try:
             return float(val)
         except ValueError:
             return val
 
+    def get_measure_simple_all(self, ch=None):
+        """Get all simple measurement values with a single query (MEAS:SIMP:VAL? ALL)
+
+        Args:
+            ch (int|None): if None, measure current channel source, if int, check channel
+
+        Returns:
+            dict: value of each item in MEASUREMENT_ITEMS, nan if not available (***)
+        """
+        return self.get_measure_simple_value('ALL', ch=ch)
+
+    def _parse_simple_all(self, response):
+        """Parse response to MEAS:SIMP:VAL? ALL: comma-separated item,value pairs
+
+        Args:
+            response (str): response from device
+
+        Returns:
+            dict: value of each item in MEASUREMENT_ITEMS, nan if not available
+        """
+        values = dict.fromkeys(self.MEASUREMENT_ITEMS, np.nan)
+
+        fields = [field.strip() for field in response.split(',')]
+        for item, val in zip(fields[::2], fields[1::2]):
+            try:
+                val = float(val)
+            except ValueError:
+                val = np.nan
+            values[self.MEASUREMENT_INDEX.get(item.lower(), item)] = val
+
+        return values
+
     def get_measure_state(self):
         """Get measurement state on/off
 
         Returns:
             bool: if True, turn measurements are active
         """
-        val = self.query('MEAS?')
-        return val == 'ON'
+        return self._get_cached('MEAS', lambda: self.query('MEAS?') == 'ON')
 
     def get_run_state(self):
         """Returns:
@@ -481,37 +727,46 @@ class SDS5034(SiglentBase):
         """Returns:
             int: channel number corresponding to waveform to be transferred from the oscilloscope
         """
-        return int(self.query('WAVeform:SOURce?')[1])
+        return self._get_cached('WAV:SOUR', lambda: int(self.query('WAVeform:SOURce?')[1]))
 
     def get_wave_startpt(self):
         """Returns:
             int: the starting index of the data for waveform transfer.
         """
-        return int(self.query('WAVeform:STARt?').strip())
+        return self._get_cached('WAV:STAR', lambda: int(self.query('WAVeform:STARt?').strip()))
 
     def get_wave_interval(self):
         """Returns:
             int: the interval between data points for waveform transfer.
         """
-        return int(self.query('WAVeform:INTerval?'))
+        return self._get_cached('WAV:INT', lambda: int(self.query('WAVeform:INTerval?')))
 
     def get_wave_npts(self):
         """Returns:
             float: the number of waveform points to be transferred
         """
-        return float(self.query('WAVeform:POINt?').strip())
+        return self._get_cached('WAV:POIN', lambda: float(self.query('WAVeform:POINt?').strip()))
 
     def get_wave_maxpt(self):
         """Returns:
             float: the maximum points of one piece, when it needs to read the waveform data in pieces.
         """
-        return float(self.query('WAVeform:MAXPoint?').strip())
+        return self._get_cached('WAV:MAXP', lambda: float(self.query('WAVeform:MAXPoint?').strip()))
+
+    def get_wave_sequence(self):
+        """Returns:
+            tuple: (frame, start) frame index of sequence waveform transfer, 0 for all
+                frames, and the index of the first frame to transfer when reading all
+                frames
+        """
+        return self._get_cached('WAV:SEQ',
+                    lambda: tuple(int(v) for v in self.query('WAVeform:SEQuence?').split(',')))
 
     def get_wave_width(self):
         """Returns:
             str: output format for the transfer of waveform data (byte|word).
         """
-        return self.query('WAVeform:WIDTh?').lower()
+        return self._get_cached('WAV:WIDT', lambda: self.query('WAVeform:WIDTh?').lower())
 
     # simple commands
     def set_adc_resolution(self, bits):
@@ -523,11 +778,15 @@ class SDS5034(SiglentBase):
         if bits not in (8, 10):
             raise RuntimeError(f'Input bits must be 8 or 10, not "{bits}"')
 
-        state = self.get_run_state()
-        self.run()
-        self.write(f'ACQuire:RESolution {bits}B')
-        if not state:
-            self.stop()
+        def setter():
+            state = self.get_run_state()
+            self.run()
+            self.write(f'ACQuire:RESolution {bits}B')
+            if not state:
+                self.stop()
+            self._invalidate_preamble()
+
+        self._set_cached('ACQ:RES', bits, setter)
 
     def set_ch_coupling(self, ch, mode):
         """Selects the coupling mode of the specified input channel.
@@ -538,6 +797,7 @@ class SDS5034(SiglentBase):
         """
         mode = mode.upper()
         assert mode in ('DC', 'AC', 'GND'), 'mode must be one of DC, AC, or GND'
+        self._invalidate_preamble(ch)
         self.write(f'CHANnel{int(ch)}:COUPling {mode}')
 
     def set_ch_impedance(self, ch, z):
@@ -567,6 +827,8 @@ class SDS5034(SiglentBase):
             ch (int): channel number
             offset (float): offset value in volts
         """
+        self._invalidate(f'CHAN{int(ch)}:OFFS')
+        self._invalidate_preamble(ch)
         return self.write(f'CHANnel{int(ch)}:OFFSet {offset:g}')
 
     def set_ch_probe(self, ch, attenuation=None):
@@ -580,6 +842,9 @@ class SDS5034(SiglentBase):
             ch (int): channel number
             attenuation (float|None): if none, set to default (1X); else should be a float
         """
+        self._invalidate(f'CHAN{int(ch)}:PROB', f'CHAN{int(ch)}:SCAL', f'CHAN{int(ch)}:OFFS')
+        self._invalidate_preamble(ch)
+
         if attenuation is None:
             self.write(f'CHANnel{int(ch)}:PROBe DEFault')
         else:
@@ -596,6 +861,8 @@ class SDS5034(SiglentBase):
             ch (int): channel number
             scale (float): vertical scaling
         """
+        self._invalidate(f'CHAN{int(ch)}:SCAL')
+        self._invalidate_preamble(ch)
         return self.write(f'CHANnel{int(ch)}:SCALe {scale:g}')
 
     def set_ch_state(self, ch, on):
@@ -606,7 +873,8 @@ class SDS5034(SiglentBase):
             on (bool): if True, turn channel on. If False turn channel off.
         """
         state = 'ON' if on else 'OFF'
-        self.write(f'CHANnel{int(ch)}:SWITch {state}')
+        self._set_cached(f'CHAN{int(ch)}:SWIT', bool(on),
+                         lambda: self.write(f'CHANnel{int(ch)}:SWITch {state}'))
 
     def set_ch_unit(self, ch, unit):
         """Changes the unit of input signal of specified channel: voltage (V) or current (A)
@@ -628,12 +896,14 @@ class SDS5034(SiglentBase):
 
         if mode.lower() in 'simple':
             mode = 'SIMP'
+            value = 'simple'
         elif mode.lower() in 'advanced':
             mode = 'ADV'
+            value = 'advanced'
         else:
             raise RuntimeError('mode must be simple|advanced')
 
-        self.write(f'MEASure:MODE {mode}')
+        self._set_cached('MEAS:MODE', value, lambda: self.write(f'MEASure:MODE {mode}'))
 
     def set_measure_state(self, state):
         """Set measurement state on/off
@@ -641,8 +911,9 @@ class SDS5034(SiglentBase):
         Args:
             state (bool): if True, turn measurements on
         """
+        value = bool(state)
         state = 'ON' if state else 'OFF'
-        self.write(f'MEASure {state}')
+        self._set_cached('MEAS', value, lambda: self.write(f'MEASure {state}'))
 
     def set_measure_adv_item(self, idx, item):
         """Set advanced measurement item
@@ -666,12 +937,7 @@ class SDS5034(SiglentBase):
             self.set_measure_adv_nitems(idx)
 
         # check item from list
-        list_lower = [par.lower() for par in self.MEASUREMENT_ITEMS]
-        item = item.lower()
-        if item not in list_lower:
-            raise RuntimeError(f'Item not in list: {self.MEASUREMENT_ITEMS}')
-        idxx = list_lower.index(item)
-        par = self.MEASUREMENT_ITEMS[idxx]
+        par = self._measurement_item(item)
 
         # write state
         self.write(f'MEAS:ADV:P{idx}:TYPE {par}')
@@ -759,12 +1025,7 @@ class SDS5034(SiglentBase):
         else:
 
             # check item from list
-            list_lower = [par.lower() for par in self.MEASUREMENT_ITEMS]
-            item = item.lower()
-            if item not in list_lower:
-                raise RuntimeError(f'Item not in list: {self.MEASUREMENT_ITEMS}')
-            idx = list_lower.index(item)
-            par = self.MEASUREMENT_ITEMS[idx]
+            par = self._measurement_item(item)
 
             # write state
             self.write(f'MEASure:SIMPle:ITEM {par},{state}')
@@ -775,7 +1036,7 @@ class SDS5034(SiglentBase):
         Args:
             ch (int): channel number
         """
-        self.write(f'MEAS:SIMP:SOUR C{ch}')
+        self._set_cached('MEAS:SIMP:SOUR', int(ch), lambda: self.write(f'MEAS:SIMP:SOUR C{ch}'))
 
     def set_run_state(self, run):
         """Start/Stop taking data, equivalent to pressing the Run/Stop button on the front panel.
@@ -794,6 +1055,7 @@ class SDS5034(SiglentBase):
         Args:
             state (bool): If True, sequence on. If False, sequence off.
         """
+        self._invalidate_preamble()
         if state:
             self.write('ACQuire:SEQuence ON')
         else:
@@ -810,6 +1072,7 @@ class SDS5034(SiglentBase):
         if value % 2 != 0:
             raise RuntimeError(f'Input {value} must be a power of 2')
 
+        self._invalidate_preamble()
         self.write(f'ACQuire:SEQuence:COUNt {int(value)}')
 
     def set_smpl_rate(self, rate):
@@ -819,6 +1082,7 @@ class SDS5034(SiglentBase):
             rate (float|str): sample rate in pts/sec or "auto"
         """
 
+        self._invalidate_preamble()
         if str(rate) in 'auto':
             self.write('ACQuire:MMANagement AUTO')
         else:
@@ -835,6 +1099,7 @@ class SDS5034(SiglentBase):
             delay (float): delay in seconds between the trigger event and the delay reference
             point on the screen
         """
+        self._invalidate_preamble()
         self.write(f'TIMebase:DELay {float(delay):E}')
 
     def set_time_scale(self, scale):
@@ -847,6 +1112,7 @@ class SDS5034(SiglentBase):
         Args:
             scale (float): seconds per division
         """
+        self._invalidate_preamble()
         self.write(f'TIMebase:SCALe {scale:E}')
 
     def set_trig_mode(self, mode):
@@ -883,25 +1149,38 @@ class SDS5034(SiglentBase):
         Args:
             ch (int): channel number
         """
-        self.write(f'WAVeform:SOURce C{int(ch)}')
+        self._set_cached('WAV:SOUR', int(ch), lambda: self.write(f'WAVeform:SOURce C{int(ch)}'))
 
     def set_wave_startpt(self, pt):
         """Args:
             pt (int): index of starting data point for waveform transfer
         """
-        self.write(f'WAVeform:STARt {int(pt)}')
+        self._set_cached('WAV:STAR', int(pt), lambda: self.write(f'WAVeform:STARt {int(pt)}'))
 
     def set_wave_interval(self, interval):
         """Args:
             interval (int): interval between data points for waveform transfer
         """
-        self.write(f'WAVeform:INTerval {int(interval)}')
+        self._set_cached('WAV:INT', int(interval),
+                         lambda: self.write(f'WAVeform:INTerval {int(interval)}'))
 
     def set_wave_npts(self, npts):
         """Args:
             npts (int): number of waveform points to be transferred
         """
-        self.write(f'WAVeform:POINt {int(npts)}')
+        self._set_cached('WAV:POIN', float(int(npts)),
+                         lambda: self.write(f'WAVeform:POINt {int(npts)}'))
+
+    def set_wave_sequence(self, frame, start=1):
+        """Sets the frame(s) of a sequence acquisition to be transferred
+
+        Args:
+            frame (int): frame index, starting from 1. If 0, transfer as many frames
+                as possible (see read_frames of the preamble) in one piece
+            start (int): index of first frame to transfer, if frame is 0
+        """
+        self._set_cached('WAV:SEQ', (int(frame), int(start)),
+                         lambda: self.write(f'WAVeform:SEQuence {int(frame)},{int(start)}'))
 
     def set_wave_width(self, format):
         """Sets the current output format for the transfer of waveform data.
@@ -911,14 +1190,105 @@ class SDS5034(SiglentBase):
         """
         format = format.upper()
         if format in 'BYTE':
-            self.write('WAVeform:WIDTh BYTE')
+            self._set_cached('WAV:WIDT', 'byte', lambda: self.write('WAVeform:WIDTh BYTE'))
         elif format in 'WORD':
-            self.write('WAVeform:WIDTh WORD')
+            self._set_cached('WAV:WIDT', 'word', lambda: self.write('WAVeform:WIDTh WORD'))
 
     # read waveform commands
+    @staticmethod
+    def decode_codes(data, nbits):
+        """Convert raw WAV:DATA? payload to signed adc codes
+
+            Payload is read in place as signed integers: int8 for BYTE transfers
+            (nbits <= 8) or little-endian int16 for WORD transfers, where the
+            adc code is left-aligned in the 16 bit word.
+
+        Args:
+            data (bytes|bytearray|np.ndarray): waveform payload, without block header or terminator
+            nbits (int): adc resolution in bits 8|10
+
+        Returns:
+            np.ndarray: adc codes, int8 for BYTE transfers (a view of data) or int16
+        """
+        if nbits > 8:
+            data = memoryview(data).cast('B')
+            data = data[:len(data) - len(data) % 2]
+            return np.frombuffer(data, dtype='<i2') >> (16-nbits)
+        return np.frombuffer(data, dtype=np.int8)
+
+    @staticmethod
+    def decode_wave(data, nbits, code_per_div, v_per_div, v_offset, dtype=np.float64):
+        """Convert raw WAV:DATA? payload to volts, see decode_codes
+
+        Args:
+            data (bytes|bytearray|np.ndarray): waveform payload, without block header or terminator
+            nbits (int): adc resolution in bits 8|10
+            code_per_div (float): adc codes per vertical division (see preamble)
+            v_per_div (float): vertical scale with probe attenuation (see preamble)
+            v_offset (float): vertical offset with probe attenuation (see preamble)
+            dtype (np.dtype): floating point type of output
+
+        Returns:
+            np.ndarray: voltages in volts
+        """
+        return Waveform.to_volts(SDS5034.decode_codes(data, nbits), nbits,
+                                 code_per_div=code_per_div,
+                                 v_per_div=v_per_div,
+                                 v_offset=v_offset,
+                                 dtype=dtype)
+
+    @classmethod
+    def parse_wave_preamble(cls, data):
+        """Decode WAVEDESC waveform preamble in a single pass
+
+            Does not need a connection to the device, and so can be used to
+            decode saved binary dumps.
+
+        Args:
+            data (bytes|bytearray|memoryview): 346 byte WAVEDESC block, optionally
+                preceded by its #9 definite-length block header
+
+        Returns:
+            dict: channel-specific scope settings, see get_wave_preamble
+        """
+
+        # skip block header
+        if data[:1] == b'#':
+            data = memoryview(data)[2+int(bytes(data[1:2])):]
+
+        preamble = dict(zip(cls.WAVEDESC_FIELDS, cls.WAVEDESC.unpack_from(data)))
+
+        # strings
+        for key in ('descriptor', 'template', 'instrum_name'):
+            preamble[key] = preamble[key].decode().replace('\x00', '')
+
+        # enumerations
+        preamble['comm_type'] = ('byte', 'word')[preamble['comm_type']]
+        preamble['comm_order'] = ('LSB', 'MSB')[preamble['comm_order']]
+        preamble['t_per_div'] = cls.TDIV_ENUM[preamble['t_per_div']]
+        preamble['coupling'] = ('DC', 'AC', 'GND')[preamble['coupling']]
+        preamble['bandwidth'] = ('OFF', '20M', '200M')[preamble['bandwidth']]
+        preamble['channel'] = f"C{preamble['channel']+1}"
+
+        # see page 562 of manual
+        if preamble['code_per_div'] > 2**8:
+            preamble['code_per_div'] /= 2**4
+
+        # adjusted vertical values
+        preamble['v_per_div'] = preamble['v_per_div_raw'] * preamble['probe_atten']
+        preamble['v_offset'] = preamble['v_offset_raw'] * preamble['probe_atten']
+
+        return preamble
+
     def get_wave_preamble(self, ch=None):
         """Get preamble for waveform data of specified channel (dict, see below for key values)
 
+            If cache_settings, the preamble is kept for each channel and waveform
+            transfer setting (start point, interval, width, sequence frame) until
+            invalidated by a setting which changes it. data_bytes then refers to the
+            transfer for which it was first read. Transfers of all sequence frames
+            are not cached, as they depend on the number of frames acquired.
+
         Args:
             ch (int|None): channel number. If None, use current set channel
 
@@ -977,265 +1347,468 @@ class SDS5034(SiglentBase):
             self.set_wave_ch(ch)
 
         # read preamble
-        self.write("WAV:PREamble?", block=False)
-        recv_all = self.read_bytes(350)
-        recv = recv_all[recv_all.find(b'#')+11:]
-
-        # convert to data
-        preamble = {}
-
-        # descriptor name. It is string, the first 8 chars are always “WAVEDESC”
-        desc = (struct.unpack('s', recv[i:i+1])[0] for i in range(16))
-        desc = (b''.join(desc)).decode()
-        preamble['descriptor'] = desc.replace('\x00', '')
-
-        # Template name. It is string, the first 7 chars are always “WAVEACE”.
-        desc = (struct.unpack('s', recv[i:i+1])[0] for i in range(16, 32))
-        desc = (b''.join(desc)).decode()
-        preamble['template'] = desc.replace('\x00', '')
-
-        # COMM_TYPE. Chosen by remote command comm_format. 0 -byte, 1- word. Default value is 0.
-        options = ['byte', 'word']
-        preamble['comm_type'] = options[struct.unpack('h', recv[32:34])[0]]
-
-        # COMM_ORDER. Chosen by remote command comm_format. 0- LSB, 1- MSB. Default value is 0.
-        options = ['LSB', 'MSB']
-        preamble['comm_order'] = options[struct.unpack('h', recv[34:36])[0]]
-
-        # wave_desc_length. Length in bytes of block WAVEDESC. (346)
-        preamble['wave_desc_bytes'] = struct.unpack('i', recv[36:40])[0]
-
-        # WAVE_ARRAY_1. Length in bytes of 1st simple data array. In
-        # transmitted waveform, represent the number of transmitted bytes in
-        # accordance with the parameter of the :WAVeform:POINt remote
-        # command and the used format (see COMM_TYPE). Only for analog
-        # channel.
-        preamble['data_bytes'] = struct.unpack('i', recv[60:64])[0]
-
-        # Instrument name. It is string, always “Siglent SDS”.
-        desc = (struct.unpack('s', recv[i:i+1])[0] for i in range(76, 92))
-        desc = (b''.join(desc)).decode()
-        preamble['instrum_name'] = desc.replace('\x00', '')
-
-        # Wave array count. Number of data points in the data array. Only for
-        # analog channel. When sequence is on, this value means the points
-        # number of single sequence frame.
-        preamble['data_npts'] = struct.unpack('i', recv[116:120])[0]
-
-        # First point. Indicates the offset relative to the beginning of the trace
-        # buffer. Value is the same as the parameter of
-        # the :WAVeform:STARt remote command.
-        preamble['data_first_pt'] = struct.unpack('i', recv[132:136])[0]
-
-        # Data interval. Indicates the interval between data points for
-        # waveform transfer. Value is the same as the parameter of
-        # the :WAVeform:INTerval remote command.
-        preamble['data_interval'] = struct.unpack('i', recv[136:140])[0]
-
-        # Read_frames, number of sequence frames transferred this time.
-        # Used to calculate the reading times of sequence waveform
-        preamble['read_frames'] = struct.unpack('i', recv[144:148])[0]
-
-        # sum_frames, number of sequence frames acquired. Used to
-        # calculate the reading times of sequence waveform
-        preamble['sum_frames'] = struct.unpack('i', recv[148:152])[0]
-
-        # Vertical gain. The value of vertical scale without probe attenuation.
-        preamble['v_per_div_raw'] = struct.unpack('f', recv[156:160])[0]
-
-        # Vertical offset. The value of vertical offset without probe attenuation
-        preamble['v_offset_raw'] = struct.unpack('f', recv[160:164])[0]
-
-        # code_per_div. The value is different for different vertical gain of different models
-        # see page 562 of manual
-        preamble['code_per_div'] = struct.unpack('f', recv[164:168])[0]
-        if preamble['code_per_div'] > 2**8:
-            preamble['code_per_div'] /= 2**4
-
-        # Adc_bit
-        preamble['adc_bit'] = struct.unpack('h', recv[172:174])[0]
+        def getter():
+            self.write("WAV:PREamble?", block=False)
+            recv = bytearray(self.WAVEDESC.size)
+            self.read_block_into(recv)
+            return self.parse_wave_preamble(recv)
 
-        # The specified frame index of sequence set by the parameter
-        # <value1> of the command :WAVeform:SEQuence. Default Value is 1
-        preamble['frame_index'] = struct.unpack('h', recv[174:176])[0]
+        key = None
+        if self.cache_settings:
+            frame = self.get_wave_sequence()[0]
+            if frame > 0:
+                key = ('WAV:PRE', self.get_wave_ch(), self.get_wave_startpt(),
+                       self.get_wave_interval(), self.get_wave_width(), frame)
 
-        # Horizontal interval. Sampling interval for time domain waveforms.
-        # Horizontal interval = 1/sampling rate
-        preamble['sample_interval'] = struct.unpack('f', recv[176:180])[0]
+        preamble = getter() if key is None else self._get_cached(key, getter)
 
-        # Horizontal offset. Trigger offset for the first sweep of the trigger,
-        # seconds between the trigger and the first data point. Unit is s.
-        preamble['t_delay_s'] = struct.unpack('d', recv[180:188])[0]
-
-        # Time_base. This is the enumerated time/div.
-        preamble['t_per_div'] = self.TDIV_ENUM[struct.unpack('h', recv[324:326])[0]]
-
-        # Vertical coupling. 0-DC,1-AC,2-GND
-        options = ['DC', 'AC', 'GND']
-        preamble['coupling'] = options[struct.unpack('h', recv[326:328])[0]]
+        # save
+        self.preambles[preamble['channel']] = preamble
 
-        # Probe attenuation.
-        preamble['probe_atten'] = struct.unpack('f', recv[328:332])[0]
+        return preamble
 
-        # Fixed vertical gain. This is the enumerated vertical scale. This value
-        # is not intuitive, and the vertical scale is usually represented by the
-        # value of address 156~159
-        preamble['fixed_v_gain'] = struct.unpack('h', recv[332:334])[0]
+    def read_wave_ch(self, ch, start_pt=0, raw=False, dtype=np.float64, time_index=True):
+        """Fetch the waveform data of a single source channel in volts
 
-        # Bandwidth limit. 0-OFF,1-20M,2-200M
-        options = ['OFF', '20M', '200M']
-        preamble['bandwidth'] = options[struct.unpack('h', recv[334:336])[0]]
+        Args:
+            ch (int): channel number
+            start_pt (int): index of starting point
+            raw (bool): if True, return the adc codes as transferred (1 or 2 bytes per
+                point), converted to volts on demand
+            dtype (np.dtype): floating point type of voltages, ex: np.float32 to halve memory
+            time_index (bool): if True, index by timestamp. If False, index by point number
+                and keep the time axis (t0, dt) in df.attrs, which avoids allocating the
+                timestamps
 
-        # Wave source. 0-C1,1-C2,2-C3,3-C4
-        # Normal command doesn't work?
-        # preamble['channel'] = f"C{struct.unpack('h', recv[344:346])[0]}"
-        preamble['channel'] = f"C{self.get_wave_ch()}"
+        Returns:
+            pd.DataFrame|Waveform: voltages of single channel, indexed by timestamp. If raw,
+                adc codes with scaling and time axis
+        """
 
-        # adjusted vertical values
-        preamble['v_per_div'] = preamble['v_per_div_raw'] * preamble['probe_atten']
-        preamble['v_offset'] = preamble['v_offset_raw'] * preamble['probe_atten']
+        # check for changes made at the scope
+        if self.cache_settings:
+            self.check_front_panel()
 
-        # save
-        self.preambles[preamble['channel']] = preamble
+        wave = self._waveform(ch, *self._transfer_wave(ch, start_pt))
+        self.store.put(wave)
 
-        return preamble
+        if raw:
+            return wave
+        return wave.to_frame(dtype, time_index=time_index)
 
-    def read_wave_ch(self, ch, start_pt=0):
-        """Fetch the waveform data of a single source channel in volts
+    def _transfer_wave(self, ch, start_pt=0, writer=None):
+        """Transfer the waveform data of a single source channel, without decoding
 
         Args:
             ch (int): channel number
             start_pt (int): index of starting point
+            writer (WaveformWriter|None): if not None, pass each piece to the writer
+                instead of keeping it, such that only one piece is held in memory
 
         Returns:
-            pd.DataFrame: voltages of single channel, indexed by timestamp
+            tuple: (buffer, nbits, preamble) adc codes as np.ndarray of bytes, number
+                of adc bits, and waveform preamble. If writer, buffer holds the last piece
         """
 
         # setup input
         self.set_wave_startpt(start_pt)
         self.set_wave_ch(ch)
 
+        # number of bits used in data read
+        nbits = self.get_adc_resolution()
+        if nbits > 8:
+            self.set_wave_width('WORD')
+        else:
+            self.set_wave_width('BYTE')
+
+        # read waveform preamble
+        preamble = self.get_wave_preamble()
+
         # set number of points to read from
         points = self.get_wave_npts()
         one_piece_num = self.get_wave_maxpt()
 
         if points == 0:
-            preamble = self.get_wave_preamble()
             points = preamble['data_npts']
             self.set_wave_npts(points)
 
-        if points > one_piece_num:
-            self.set_wave_npts(one_piece_num)
-
-        # number of bits used in data read
-        nbits = self.get_adc_resolution()
-        if nbits > 8:
-            self.set_wave_width('WORD')
+        # preallocate receive buffer for all pieces, or one piece if writing
+        width = 2 if preamble['comm_type'] == 'word' else 1
+        if writer is None:
+            buffer = np.empty(int(points)*width, dtype=np.uint8)
         else:
-            self.set_wave_width('BYTE')
+            buffer = np.empty(int(min(points, one_piece_num))*width, dtype=np.uint8)
+            wave = self._waveform(ch, buffer[:0], nbits, preamble)
+            writer.start(wave, int(points), preamble)
+        view = memoryview(buffer)
 
-        # read waveform data?
+        # read waveform data, each piece straight into its slice of the buffer
         read_times = math.ceil(points/one_piece_num)
-        recv_all = []
-        for i in range(0, read_times):
-            start = i*one_piece_num
-            self.set_wave_startpt(start)
-            self.write("WAV:DATA?", block=False)
-            recv_rtn = self.read_raw()
-            recv = list(recv_rtn[recv_rtn.find(b'#') + 11:-2])
-            recv_all += recv
-
-        # convert bits to float
-        if nbits > 8:
-            convert_data = []
-            for i in range(0, int(len(recv_all) / 2)):
-                data_16bit = recv_all[2 * i + 1] * 256 + recv_all[2 * i]
-                data = data_16bit >> (16-nbits)
-                convert_data.append(data)
-        else:
-            convert_data = recv_all
+        nrecv = 0
+        try:
+            for i in range(0, read_times):
 
-        # convert ints to volts
-        volt_value = []
-        for data in convert_data:
+                # set piece, at most one_piece_num points
+                if read_times > 1:
+                    self.set_wave_startpt(start_pt + i*one_piece_num*preamble['data_interval'])
+                    self.set_wave_npts(min(one_piece_num, points - i*one_piece_num))
 
-            # 12bit-2047, 8bit-127
-            if data > pow(2, nbits-1)-1:
-                data = data - pow(2, nbits)
-            else:
-                pass
-            volt_value.append(data)
+                self.write("WAV:DATA?", block=False)
+                if writer is None:
+                    nrecv += self.read_block_into(view[nrecv:])
+                else:
+                    nrecv = self.read_block_into(view)
+                    writer.write(ch, self.decode_codes(buffer[:nrecv], nbits))
 
-        volt_value = np.array(volt_value)
+        # close the record, such that the writer can be used again
+        except BaseException:
+            if writer is not None:
+                writer.abort(ch)
+            raise
 
-        if nbits == 10:
-            volt_value = volt_value/4
+        # restore number of points for the next read
+        finally:
+            if read_times > 1:
+                self.set_wave_npts(points)
 
-        # read waveform preamble
-        preamble = self.get_wave_preamble()
-        code = preamble['code_per_div']
-        vdiv = preamble['v_per_div']
-        offset = preamble['v_offset']
-        tdiv = preamble['t_per_div']
-        delay = preamble['t_delay_s']
-        interval = preamble['sample_interval']
+        buffer = buffer[:nrecv]
 
-        # adjust voltage values
-        volt_value = volt_value / code * vdiv - offset
+        if writer is not None:
+            writer.finish(ch)
 
-        # get times
-        idx = np.arange(len(volt_value))
-        time_value = -delay - (tdiv * self.HORI_NUM / 2) + idx * interval
+        return (buffer, nbits, preamble)
 
-        # make data frame for output
-        df = pd.DataFrame({f'C{ch}':volt_value, 'time_s':time_value})
-        df.set_index('time_s', inplace=True)
+    def _waveform(self, ch, buffer, nbits, preamble):
+        """Wrap waveform data as codes with scaling and time axis from the preamble
 
-        # save
-        self.waveforms.drop(columns=[f'C{ch}'], errors='ignore', inplace=True)
-        self.waveforms = pd.concat((self.waveforms, df), axis='columns')
+        Args:
+            ch (int): channel number
+            buffer (np.ndarray): adc codes as bytes, see _transfer_wave
+            nbits (int): number of adc bits
+            preamble (dict): waveform preamble
 
-        return df
+        Returns:
+            Waveform: adc codes of single channel
+        """
+        t0, dt = self._time_axis(preamble)
+        return Waveform(ch, self.decode_codes(buffer, nbits), nbits,
+                        code_per_div=preamble['code_per_div'],
+                        v_per_div=preamble['v_per_div'],
+                        v_offset=preamble['v_offset'],
+                        t0=t0,
+                        dt=dt)
+
+    def _time_axis(self, preamble):
+        """Time axis of the waveform from the preamble
+
+        Args:
+            preamble (dict): waveform preamble
+
+        Returns:
+            tuple: (t0, dt) time of the first point relative to the trigger and
+                time between points, in seconds
+        """
+        t0 = -preamble['t_delay_s'] - (preamble['t_per_div'] * self.HORI_NUM / 2)
+        return (t0, preamble['sample_interval'])
+
+    def record_wave_ch(self, ch, writer, start_pt=0):
+        """Transfer the waveform of a single source channel straight to disk
+
+            Each piece is written as it is received, so the waveform is never
+            held whole in memory.
+
+        Args:
+            ch (int): channel number
+            writer (WaveformWriter): destination, ex: NpyWriter or HDF5Writer
+            start_pt (int): index of starting point
+        """
 
-    def read_wave_active(self, start_pt=0):
+        # check for changes made at the scope
+        if self.cache_settings:
+            self.check_front_panel()
+
+        self._transfer_wave(ch, start_pt=start_pt, writer=writer)
+
+    def record_wave_active(self, writer, start_pt=0):
+        """Transfer the waveforms of all active (displayed) analog input channels straight to disk
+
+        Args:
+            writer (WaveformWriter): destination, ex: NpyWriter or HDF5Writer
+            start_pt (int): index of starting point
+        """
+        self.stop()
+
+        # check for changes made at the scope
+        if self.cache_settings:
+            self.check_front_panel()
+
+        for ch, on in zip(range(1, 5), self.get_ch_states()):
+            if on:
+                self._transfer_wave(ch, start_pt=start_pt, writer=writer)
+
+    def read_wave_active(self, start_pt=0, raw=False, dtype=np.float64, time_index=True):
         """Read the waveforms of all active (displayed) analog input channels
 
+            Each channel is decoded in a worker thread while the next channel
+            is being transferred.
+
         Args:
             start_pt (int): index of starting point to read
+            raw (bool): if True, return the adc codes as transferred, see read_wave_ch
+            dtype (np.dtype): floating point type of voltages
+            time_index (bool): if True, index by timestamp, else by point number, see read_wave_ch
 
         Returns:
-            pd.DataFrame: voltages of all active channels, indexed by timestamp
+            pd.DataFrame|dict: voltages of all active channels, indexed by timestamp. If
+                raw, Waveform of each channel keyed by channel number
         """
 
         # stop run state
 
         self.stop()
 
-        # iterate over all possible channels
+        # check for changes made at the scope
+        if self.cache_settings:
+            self.check_front_panel()
+
+        # all channel states in one query
+        channels = [ch for ch, on in zip(range(1, 5), self.get_ch_states()) if on]
+
+        if raw:
+            waves = {}
+            for ch in channels:
+                waves[ch] = self._waveform(ch, *self._transfer_wave(ch, start_pt=start_pt))
+                self.store.put(waves[ch])
+            return waves
+
+        # transfer channel N+1 while decoding channel N
         waves = []
-        for i in range(1, 5):
+        futures = []
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            for ch in channels:
+                wave = self._waveform(ch, *self._transfer_wave(ch, start_pt=start_pt))
+                self.store.put(wave)
+                waves.append(wave)
+                futures.append(pool.submit(wave.volts, dtype))
+            volts = [future.result() for future in futures]
 
-            if self.get_ch_state(i):
-                waves.append(self.read_wave_ch(i, start_pt=start_pt))
+        # make dataframe, channels share a time axis
+        return Waveform.join(waves, volts, time_index=time_index)
 
-        # make dataframe
-        df = pd.concat(waves, axis='columns')
+    def read_wave_sequence(self, ch, timestamps=False):
+        """Fetch all frames of a sequence (segmented memory) acquisition of a single channel
 
-        # save
-        self.waveforms.drop(columns=df.columns, errors='ignore', inplace=True)
-        self.waveforms = pd.concat((self.waveforms, df), axis='columns')
+            Frames are transferred as many at a time as allowed by the maximum
+            number of points per transfer (read_frames of the preamble).
+
+        Args:
+            ch (int): channel number
+            timestamps (bool): if True, also read the trigger time of each frame from
+                the history, 100 frames per query (see _read_sequence_timestamps)
+
+        Returns:
+            tuple: (time_s, volts), or (time_s, volts, stamps_s) if timestamps
+                time_s (np.ndarray): time of each point relative to the trigger, shape (n_points,)
+                volts (np.ndarray): voltages, shape (n_frames, n_points)
+                stamps_s (np.ndarray): trigger time of each frame relative to the first, shape (n_frames,)
+        """
+
+        # check for changes made at the scope
+        if self.cache_settings:
+            self.check_front_panel()
+
+        # setup input
+        self.set_wave_startpt(0)
+        self.set_wave_ch(ch)
+
+        nbits = self.get_adc_resolution()
+        if nbits > 8:
+            self.set_wave_width('WORD')
+        else:
+            self.set_wave_width('BYTE')
 
-        return df
+        # read preamble for transfer of all frames
+        sequence = self.get_wave_sequence()
+        self.set_wave_sequence(0, 1)
+        preamble = self.get_wave_preamble()
+        nframes = preamble['sum_frames']
+        read_frames = max(preamble['read_frames'], 1)
+
+        # preallocate receive buffer for all frames
+        width = 2 if preamble['comm_type'] == 'word' else 1
+        buffer = np.empty(nframes*preamble['data_npts']*width, dtype=np.uint8)
+        view = memoryview(buffer)
+
+        # read waveform data, read_frames at a time
+        nrecv = 0
+        try:
+            for start in range(1, nframes+1, read_frames):
+                self.set_wave_sequence(0, start)
+                self.write("WAV:DATA?", block=False)
+                nrecv += self.read_block_into(view[nrecv:])
+        finally:
+            self.set_wave_sequence(*sequence)
+
+        # convert codes to volts
+        volts = self.decode_wave(buffer[:nrecv], nbits,
+                                 code_per_div=preamble['code_per_div'],
+                                 v_per_div=preamble['v_per_div'],
+                                 v_offset=preamble['v_offset'])
+        volts = volts.reshape(nframes, -1)
+
+        # get times
+        t0, dt = self._time_axis(preamble)
+        time_s = t0 + np.arange(volts.shape[1]) * dt
+
+        if timestamps:
+            return (time_s, volts, self._read_sequence_timestamps(nframes))
+        return (time_s, volts)
+
+    def _read_sequence_timestamps(self, nframes, nquery=100):
+        """Read trigger times of sequence frames from the history
+
+        Args:
+            nframes (int): number of frames
+            nquery (int): number of frames to query per message
+
+        Returns:
+            np.ndarray: trigger time of each frame in seconds, relative to the first frame
+        """
+        state = self.query('HISTORy?')
+        self.write('HISTORy ON')
+
+        # times as hh:mm:ss.ffffff, several frames per message
+        stamps = []
+        try:
+            for start in range(1, nframes+1, nquery):
+                frames = range(start, min(start+nquery, nframes+1))
+                message = ';:'.join(f'HISTORy:FRAMe {i};:HISTORy:TIME?' for i in frames)
+                stamps.extend(self.query(message).split(';'))
+        finally:
+            self.write(f'HISTORy {state}')
+
+        # convert to seconds, allowing for midnight
+        seconds = []
+        for stamp in stamps:
+            hours, minutes, sec = stamp.strip().split(':')
+            seconds.append(float(hours)*3600 + float(minutes)*60 + float(sec))
 
-    def draw_wave(self, ch, ax=None, adjust_ylim=True, **plotargs):
+        seconds = np.array(seconds)
+        return (seconds - seconds[0]) % 86400
+
+    def stream_acquisitions(self, channels, n=None, drop=False, poll=1e-3, maxsize=2, time_index=True):
+        """Acquire single triggers and read waveforms in a background thread, yielding each acquisition
+
+            The next trigger is armed and transferred while the caller processes
+            the previous acquisition. The connection is used by the background
+            thread, so don't talk to the scope while streaming. Use as:
+
+                for df in sds.stream_acquisitions((1, 2), n=100):
+                    process(df)
+
+            Statistics are kept in self.stream_stats:
+
+                triggers:   number of acquisitions read from the scope
+                delivered:  number of acquisitions yielded
+                dropped:    acquisitions discarded because the queue was full (drop=True)
+                late:       acquisitions which waited for space in the queue, leaving the
+                            scope idle (drop=False)
+                rate_hz:    sustained triggers per second
+
+        Args:
+            channels (iterable): channel numbers to read
+            n (int|None): number of acquisitions to yield. If None, continue until the
+                generator is closed
+            drop (bool): if True, discard the oldest queued acquisition if the caller is
+                too slow. If False, wait for the caller
+            poll (float): seconds between trigger state queries
+            maxsize (int): number of acquisitions which can be queued, 2 for double buffering
+            time_index (bool): if True, index by timestamp, else by point number, see read_wave_ch
+
+        Yields:
+            pd.DataFrame: voltages of the channels, indexed by timestamp (see Waveform.join)
+        """
+
+        channels = [int(ch) for ch in channels]
+        frames = queue.Queue(maxsize=maxsize)
+        stop = threading.Event()
+        errors = []
+
+        stats = {'triggers': 0, 'delivered': 0, 'dropped': 0, 'late': 0, 'rate_hz': 0.0}
+        self.stream_stats = stats
+        t0 = time.perf_counter()
+
+        def acquire():
+            try:
+                while not stop.is_set():
+
+                    # arm and wait for trigger
+                    self.set_trig_mode('single')
+                    while self.get_trig_state() != 'Stop':
+                        if stop.is_set():
+                            return
+                        time.sleep(poll)
+
+                    # transfer
+                    waves = [self.read_wave_ch(ch, raw=True) for ch in channels]
+                    df = Waveform.join(waves, time_index=time_index)
+                    stats['triggers'] += 1
+                    stats['rate_hz'] = stats['triggers'] / (time.perf_counter() - t0)
+
+                    # hand over
+                    try:
+                        frames.put_nowait(df)
+                    except queue.Full:
+                        if drop:
+                            try:
+                                frames.get_nowait()
+                                stats['dropped'] += 1
+                            except queue.Empty:
+                                pass
+                            frames.put_nowait(df)
+                        else:
+                            stats['late'] += 1
+                            while not stop.is_set():
+                                try:
+                                    frames.put(df, timeout=0.1)
+                                    break
+                                except queue.Full:
+                                    pass
+
+            except Exception as err:
+                errors.append(err)
+
+        thread = threading.Thread(target=acquire, daemon=True)
+        thread.start()
+
+        try:
+            while n is None or stats['delivered'] < n:
+                try:
+                    df = frames.get(timeout=0.1)
+                except queue.Empty:
+                    if not thread.is_alive():
+                        if errors:
+                            raise errors[0]
+                        break
+                    continue
+
+                stats['delivered'] += 1
+                yield df
+        finally:
+            stop.set()
+            thread.join()
+
+    def draw_wave(self, ch, ax=None, adjust_ylim=True, decimate=True, **plotargs):
         """Draw waveform for single channel, as shown on scope screen
 
-            Must read the waveform first
+            Draws the last waveform in self.store, reads the waveform if there is none
 
         Args:
             ch (int): channel number
             ax (plt.Axes|None): object to draw in, if none then make new figure
             adjust_ylim (bool): if True, change ylim to match scope
+            decimate (bool): if True, draw the min/max envelope at the resolution of the
+                axes (see Waveform.envelope), recalculated on zoom and pan
             plotargs: passed to ax.plot()
         """
 
@@ -1245,30 +1818,36 @@ class SDS5034(SiglentBase):
             ax = plt.gca()
 
         # draw
-        try:
-            df = self.waveforms[f'C{ch}']
-        except KeyError:
-            self.read_wave_ch(ch)
-            df = self.waveforms[f'C{ch}']
-        ax.plot(df.index.values, df.values, label=f'CH{ch}', **plotargs)
+        wave = self.store.latest(ch)
+        if wave is None:
+            wave = self.read_wave_ch(ch, raw=True)
+
+        if decimate:
+            nbins = lambda: max(int(ax.bbox.width), 100)
+            line, = ax.plot(*wave.envelope(nbins=nbins()), label=f'CH{ch}', **plotargs)
 
-        # get preamble
-        pre = self.preambles[f'C{ch}']
+            # redraw visible range on zoom
+            def update(ax):
+                line.set_data(*wave.envelope(*ax.get_xlim(), nbins=nbins()))
+                ax.figure.canvas.draw_idle()
+            ax.callbacks.connect('xlim_changed', update)
+
+        else:
+            ax.plot(wave.time, wave.volts(), label=f'CH{ch}', **plotargs)
 
         # set plot elements
         ax.set_xlabel('Time (s)')
         ax.set_ylabel('Voltage (V)')
         if adjust_ylim:
-            ax.set_ylim(-4*pre['v_per_div'], 4*pre['v_per_div'])
+            ax.set_ylim(-4*wave.v_per_div, 4*wave.v_per_div)
         ax.legend(fontsize='x-small')
 
-    def draw_wave_all(self, ax=None, **plotargs):
-        """Draw all read waveforms, as shown on scope screen
-
-            Must read the waveform first
+    def draw_wave_all(self, ax=None, decimate=True, **plotargs):
+        """Draw the last waveform of all channels in self.store, as shown on scope screen
 
         Args:
             ax (plt.Axes|None): object to draw in, if none then make new figure
+            decimate (bool): if True, draw the min/max envelope, see draw_wave
             plotargs: passed to ax.plot()
         """
 
@@ -1276,5 +1855,5 @@ class SDS5034(SiglentBase):
             plt.figure()
             ax = plt.gca()
 
-        for col in self.waveforms:
-            self.draw_wave(int(col[1]), ax=ax, adjust_ylim=False, **plotargs)
+        for ch in self.store.channels():
+            self.draw_wave(ch, ax=ax, adjust_ylim=False, decimate=decimate, **plotargs)
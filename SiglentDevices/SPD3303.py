@@ -8,21 +8,60 @@
 """
 
 from . import SiglentBase
+import numpy as np
+import pandas as pd
+import time, math, threading
 
 class SPD3303(SiglentBase):
     """Control siglent programmable power supply
 
         Attributes:
 
+            MEASURE_ITEMS (tuple): (field, SCPI header) of each quantity read by read_all
+            STATUS_MODES (dict): operation mode from bits 2-3 of SYSTem:STATus?
+            STATUS_CHANNELS (tuple): channels reported in SYSTem:STATus?
+            TIMER_GROUPS (int): number of steps in the timer sequence of a channel
+            TIMER_MAX_S (float): longest time of a timer step in seconds
+            TIMER_ATOL (float): tolerance when verifying timer sequences, values are
+                rounded by the device
+            SPIN_S (float): run_profile busy-waits for this long before each setpoint,
+                as sleeping is not precise enough
     """
 
-    def __init__(self, hostname='tucan-dcps1.triumf.ca'):
+    MEASURE_ITEMS = (('volt', 'VOLTage'), ('amp', 'CURRent'), ('power', 'POWEr'))
+    STATUS_MODES = {0b01: 'independent', 0b10: 'series', 0b11: 'parallel'}
+    STATUS_CHANNELS = (1, 2)
+    TIMER_GROUPS = 5
+    TIMER_MAX_S = 10000
+    TIMER_ATOL = 1e-3
+    SPIN_S = 2e-3
+
+    def __init__(self, hostname='tucan-dcps1.triumf.ca', transport='vxi11', port=None):
         """Init.
 
         Args:
             hostname (str): address of device (DNS or IP)
+            transport (str): vxi11|socket, see SiglentBase
+            port (int|None): port for socket transport
+        """
+        super().__init__(hostname=hostname, transport=transport, port=port)
+
+        # background logger, see start_logging
+        self._log = None
+        self._log_count = 0
+        self._log_missed = 0
+        self._log_error = None
+        self._log_lock = threading.Lock()
+        self._log_stop = threading.Event()
+        self._log_thread = None
+
+    def batch(self):
+        """Queue writes and send them as a single message, see SiglentBase.batch
+
+            The device does not support *OPC? or SYSTem:ERRor?, so the batch is
+            sent without waiting or checking for errors.
         """
-        super().__init__(hostname=hostname)
+        return super().batch(wait=False)
 
     def get_ch(self):
         """Get channel which will be operated
@@ -62,6 +101,66 @@ class SPD3303(SiglentBase):
         """
         return self.query('*IDN?').strip()
 
+    def get_log(self):
+        """Copy the readings of the background logger, without stopping it
+
+        Returns:
+            np.recarray: readings in time order, see reading_dtype
+        """
+        if self._log is None:
+            raise RuntimeError('Nothing logged, call start_logging first')
+
+        with self._log_lock:
+            count = self._log_count
+            log = self._log.copy()
+
+        # unwrap ring buffer
+        if count > len(log):
+            log = np.roll(log, -(count % len(log)))
+        else:
+            log = log[:count]
+        return log.view(np.recarray)
+
+    def get_log_frame(self):
+        """Copy the readings of the background logger as a DataFrame
+
+        Returns:
+            pd.DataFrame: readings indexed by time (host time.time()), see reading_dtype
+        """
+        return pd.DataFrame(self.get_log()).set_index('time')
+
+    def get_log_stats(self):
+        """Get statistics of the background logger
+
+        Returns:
+            dict: with keys
+                running (bool): True if the logger is running
+                samples (int): number of readings taken
+                kept (int): number of readings in the buffer
+                missed (int): number of sampling times skipped as the previous
+                    reading was not finished
+                rate_hz (float): achieved rate over the readings in the buffer
+                latency_p50, latency_p90, latency_p99, latency_max (float): query
+                    duration percentiles over the readings in the buffer, in seconds
+                error (Exception|None): error which stopped the logger
+        """
+        log = self.get_log()
+
+        stats = {'running': self.logging,
+                 'samples': self._log_count,
+                 'kept': len(log),
+                 'missed': self._log_missed,
+                 'rate_hz': np.nan,
+                 'error': self._log_error}
+
+        if len(log) > 1:
+            stats['rate_hz'] = (len(log)-1) / (log.time[-1] - log.time[0])
+
+        for pc in (50, 90, 99):
+            stats[f'latency_p{pc}'] = np.percentile(log.latency, pc) if len(log) else np.nan
+        stats['latency_max'] = log.latency.max() if len(log) else np.nan
+        return stats
+
     def get_power(self, ch=None):
         """Query power value for specified channel, if there is no specified channel,
         query the current channel.
@@ -80,6 +179,14 @@ class SPD3303(SiglentBase):
 
         return float(val.strip())
 
+    def get_status(self):
+        """Get state of the outputs from the system status register
+
+        Returns:
+            dict: see parse_status
+        """
+        return self.parse_status(self.query('SYSTem:STATus?'))
+
     def get_timer_par(self, ch, group):
         """Get timing parameters of specified channel
 
@@ -95,6 +202,26 @@ class SPD3303(SiglentBase):
         # format output
         return {key : float(val) for key, val in zip(('volt', 'amp', 'sec'), val.split(','))}
 
+    def get_timer_sequence(self, ch):
+        """Get timing parameters of all steps of one or more channels in a single query
+
+        Args:
+            ch (int|list): channel number, or list of channel numbers
+
+        Returns:
+            np.ndarray: columns (volt, amp, sec) for each step, shape (TIMER_GROUPS, 3).
+                If ch is a list, shape (len(ch), TIMER_GROUPS, 3)
+        """
+        channels = [ch] if np.isscalar(ch) else list(ch)
+        messages = [f'TIMEr:SET? CH{int(c)},{group}' for c in channels
+                                                    for group in range(1, self.TIMER_GROUPS+1)]
+        responses = self.query_many(messages)
+
+        values = [[float(v) for v in val.split(',')] for val in responses]
+        values = np.array(values).reshape(len(channels), self.TIMER_GROUPS, 3)
+
+        return values[0] if np.isscalar(ch) else values
+
     def get_voltage(self, ch=None):
         """Query voltage value for specified channel, if there is no specified channel,
         query the current channel.
@@ -113,6 +240,198 @@ class SPD3303(SiglentBase):
 
         return float(val.strip())
 
+    @property
+    def logging(self):
+        """True if the background logger is running, see start_logging"""
+        return self._log_thread is not None and self._log_thread.is_alive()
+
+    def _log_loop(self, rate_hz, channels):
+        """Take readings at fixed times until stopped, see start_logging"""
+        period = 1 / rate_hz
+        t_start = time.monotonic()
+        k = 0   # index of the next sampling time
+
+        try:
+            while not self._log_stop.is_set():
+                reading = self.read_all(channels)
+
+                with self._log_lock:
+                    self._log[self._log_count % len(self._log)] = reading
+                    self._log_count += 1
+
+                # skip sampling times which have passed, on a fixed grid so there is no drift
+                k += 1
+                n = math.floor((time.monotonic() - t_start) / period)
+                if n >= k:
+                    self._log_missed += n - k + 1
+                    k = n + 1
+
+                self._log_stop.wait(t_start + k*period - time.monotonic())
+
+        except Exception as err:
+            self._log_error = err
+
+    @classmethod
+    def parse_status(cls, val):
+        """Decode the response to SYSTem:STATus?
+
+        Args:
+            val (str): register value in hex, ex: 0x0054
+
+        Returns:
+            dict: with keys
+                status (int): register value
+                mode (str): independent|series|parallel
+                CH<n>_on (bool): True if output is on
+                CH<n>_cc (bool): True if in constant current mode, False if constant voltage
+                CH<n>_timer (bool): True if timer is on
+                CH<n>_wave (bool): True if waveform display is on
+        """
+        status = int(val.strip(), 16)
+        out = {'status': status,
+               'mode': cls.STATUS_MODES.get((status >> 2) & 0b11, 'unknown')}
+
+        for i, ch in enumerate(cls.STATUS_CHANNELS):
+            out[f'CH{ch}_on'] = bool(status >> (4+i) & 1)
+            out[f'CH{ch}_cc'] = bool(status >> i & 1)
+            out[f'CH{ch}_timer'] = bool(status >> (6+i) & 1)
+            out[f'CH{ch}_wave'] = bool(status >> (8+i) & 1)
+        return out
+
+    @classmethod
+    def reading_dtype(cls, channels=(1, 2, 3)):
+        """Type of the record returned by read_all
+
+        Args:
+            channels (tuple): channel numbers
+
+        Returns:
+            np.dtype: with fields
+                time (f8): host time (time.time()) halfway through the query
+                latency (f8): duration of the query in seconds
+                status (u2): SYSTem:STATus? register
+                CH<n>_volt, CH<n>_amp, CH<n>_power (f8): measured values, nan if not readable
+                CH<n>_on, CH<n>_cc (?): output on and constant current, for CH1 and CH2
+        """
+        fields = [('time', 'f8'), ('latency', 'f8'), ('status', 'u2')]
+        for ch in channels:
+            fields.extend((f'CH{int(ch)}_{name}', 'f8') for name, _ in cls.MEASURE_ITEMS)
+        for ch in channels:
+            if ch in cls.STATUS_CHANNELS:
+                fields.extend(((f'CH{int(ch)}_on', '?'), (f'CH{int(ch)}_cc', '?')))
+        return np.dtype(fields)
+
+    def read_all(self, channels=(1, 2, 3)):
+        """Read voltage, current and power of several channels and the status register
+            in a single query
+
+        Args:
+            channels (tuple): channel numbers
+
+        Returns:
+            np.record: see reading_dtype, ex: reading.CH1_volt
+        """
+        messages = [f'MEASure:{header}? CH{int(ch)}' for ch in channels
+                                                    for _, header in self.MEASURE_ITEMS]
+        messages.append('SYSTem:STATus?')
+
+        t0 = time.time()
+        responses = self.query_many(messages)
+        t1 = time.time()
+
+        values = []
+        for val in responses[:-1]:
+            try:
+                values.append(float(val.strip()))
+            except ValueError:
+                values.append(np.nan)
+
+        status = self.parse_status(responses[-1])
+        state = [status[f'CH{int(ch)}_{key}'] for ch in channels if ch in self.STATUS_CHANNELS
+                                              for key in ('on', 'cc')]
+
+        row = ((t0+t1)/2, t1-t0, status['status'], *values, *state)
+        return np.rec.array([row], dtype=self.reading_dtype(channels))[0]
+
+    def run_profile(self, profiles, timer=True):
+        """Apply voltage and current setpoints at given times, blocking until the last is set
+
+            Setpoints are scheduled from a single start time on the monotonic
+            clock, so late writes do not delay the ones after. Profiles of CH1
+            and CH2 with up to TIMER_GROUPS setpoints are run by the timer of the
+            device instead: the host only turns on the timer. The last timer step
+            is held for TIMER_MAX_S, turn off the timer with set_timer.
+
+        Args:
+            profiles (dict): setpoints of each channel, keyed by channel number.
+                np.ndarray of shape (n, 3) with columns (time in seconds from start,
+                voltage in volts, current in amps), in time order
+            timer (bool): if True, run short profiles on the timer of the device
+
+        Returns:
+            dict: timing error of each setpoint in seconds, keyed by channel number.
+                Time at which the write of the setpoint returned less the scheduled
+                time, so it includes the time to send the command. For
+                profiles run by the timer only the first setpoint is written by
+                the host, the others are nan.
+        """
+        events = []     # (time, channel, setpoint index)
+        errors = {}
+        timers = {}
+
+        for ch, prof in profiles.items():
+            prof = np.asarray(prof, dtype=float)
+            if prof.ndim != 2 or prof.shape[1] != 3:
+                raise RuntimeError(f'Profile of CH{ch} must have shape (n, 3), not {prof.shape}')
+            if np.any(np.diff(prof[:, 0]) < 0):
+                raise RuntimeError(f'Profile of CH{ch} is not in time order')
+
+            errors[ch] = np.full(len(prof), np.nan)
+
+            if timer and ch in self.STATUS_CHANNELS and len(prof) <= self.TIMER_GROUPS:
+                timers[ch] = prof
+                events.append((prof[0, 0], ch, -1))
+            else:
+                events.extend((t, ch, i) for i, t in enumerate(prof[:, 0]))
+
+        # program timers before starting the clock
+        for ch, prof in timers.items():
+            sec = np.append(np.diff(prof[:, 0]), self.TIMER_MAX_S)
+            self.set_timer_sequence(ch, np.column_stack((prof[:, 1:], sec)))
+
+        events.sort(key=lambda event: event[0])
+        t_start = time.monotonic()
+
+        for t, ch, i in events:
+            t_event = t_start + t
+
+            # sleep, then spin for the last bit
+            wait = t_event - time.monotonic() - self.SPIN_S
+            if wait > 0:
+                time.sleep(wait)
+            while time.monotonic() < t_event:
+                time.sleep(0)   # release the GIL for the logger thread
+
+            if i < 0:
+                self.set_timer(ch, True)
+                errors[ch][0] = time.monotonic() - t_event
+            else:
+                volt, amp = profiles[ch][i][1:]
+                self.write(self._join([f'CH{int(ch)}:VOLTage {float(volt)}',
+                                       f'CH{int(ch)}:CURRent {float(amp)}']))
+                errors[ch][i] = time.monotonic() - t_event
+
+        return errors
+
+    def save_log(self, path):
+        """Save the readings of the background logger to a parquet file.
+            Requires pyarrow or fastparquet
+
+        Args:
+            path (str): path to file
+        """
+        self.get_log_frame().to_parquet(path)
+
     def set_ch(self, ch):
         """Set channel which will be operated
 
@@ -195,6 +514,44 @@ class SPD3303(SiglentBase):
         """
         self.write(f'TIMEr:SET CH{int(ch)},{int(group)},{volt},{amp},{sec}')
 
+    def set_timer_sequence(self, ch, sequence, verify=True):
+        """Set timing parameters of all steps of one or more channels in a single message
+
+        Args:
+            ch (int|list): channel number, or list of channel numbers
+            sequence (np.ndarray): columns (volt, amp, sec) for each step, shape (n, 3)
+                with n <= TIMER_GROUPS. Missing steps are set to zero. If ch is a list,
+                shape (len(ch), n, 3), or (n, 3) for the same sequence on all channels
+            verify (bool): if True, read back the sequence and raise RuntimeError if
+                it differs
+        """
+        channels = [ch] if np.isscalar(ch) else list(ch)
+
+        sequence = np.asarray(sequence, dtype=float)
+        if sequence.ndim == 2:
+            sequence = np.broadcast_to(sequence, (len(channels), ) + sequence.shape)
+
+        nsteps = sequence.shape[1]
+        if sequence.shape[0] != len(channels) or sequence.shape[2] != 3 or nsteps > self.TIMER_GROUPS:
+            raise RuntimeError(f'Timer sequence must have shape (n<={self.TIMER_GROUPS}, 3) per channel, '
+                               f'not {sequence.shape}')
+
+        # pad missing steps
+        full = np.zeros((len(channels), self.TIMER_GROUPS, 3))
+        full[:, :nsteps] = sequence
+
+        with self.batch():
+            for c, seq in zip(channels, full):
+                for group, (volt, amp, sec) in enumerate(seq, start=1):
+                    self.set_timer_par(c, group, volt, amp, sec)
+
+        if verify:
+            readback = self.get_timer_sequence(channels)
+            if not np.allclose(readback, full, rtol=0, atol=self.TIMER_ATOL):
+                bad = [f'CH{c}' for c, r, f in zip(channels, readback, full)
+                       if not np.allclose(r, f, rtol=0, atol=self.TIMER_ATOL)]
+                raise RuntimeError(f'Timer sequence of {bad} not set, read back {readback}')
+
     def set_voltage(self, ch, value):
         """Set voltage value of selected channel
 
@@ -203,3 +560,45 @@ class SPD3303(SiglentBase):
             value (float): voltage in volts
         """
         self.write(f'CH{int(ch)}:VOLTage {float(value)}')
+
+    def start_logging(self, rate_hz=20, channels=(1, 2, 3), capacity=100000):
+        """Take readings (see read_all) at a fixed rate in a background thread
+
+            Readings are kept in a ring buffer of fixed size, the oldest are
+            overwritten. Sampling times are on a fixed grid, if a reading takes
+            longer than a period the sampling times which have passed are skipped
+            and counted as missed. Other methods can be used while logging, each
+            query waits for the reading in progress.
+
+            Read with get_log, get_log_frame, get_log_stats or save_log.
+
+        Args:
+            rate_hz (float): readings per second
+            channels (tuple): channel numbers
+            capacity (int): number of readings kept
+        """
+        if self.logging:
+            raise RuntimeError('Already logging, call stop_logging first')
+
+        self._log = np.zeros(int(capacity), dtype=self.reading_dtype(channels))
+        self._log_count = 0
+        self._log_missed = 0
+        self._log_error = None
+        self._log_stop.clear()
+
+        self._log_thread = threading.Thread(target=self._log_loop,
+                                            args=(rate_hz, tuple(channels)),
+                                            daemon=True)
+        self._log_thread.start()
+
+    def stop_logging(self):
+        """Stop the background logger. Readings are kept until the next start_logging"""
+        if self._log_thread is None:
+            return
+
+        self._log_stop.set()
+        self._log_thread.join()
+        self._log_thread = None
+
+        if self._log_error is not None:
+            raise self._log_error
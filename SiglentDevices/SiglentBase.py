@@ -6,6 +6,9 @@
 """
 
 import pyvisa
+import threading
+from contextlib import contextmanager
+from .SocketTransport import SocketTransport
 
 class SiglentBase(object):
     """Control siglent digital device and send messages
@@ -13,27 +16,250 @@ class SiglentBase(object):
         Attributes:
 
             ADDRESS (str): format to connect to device
+            ESR_LOCAL (int): bits of the event status register which indicate settings may have changed locally
+            TRANSPORTS (tuple): connection types which can be used to talk to the device
+            cache_settings (bool): if True, keep a mirror of settings written to and read
+                from the device. Getters return cached values and setters skip writes
+                which would not change anything. Use refresh() if the device may have
+                been changed by other means.
+            lock (threading.RLock): held during each query, write, write_raw and the
+                sending of a batch, such that these can be called from several threads.
+                Batches are queued per thread. Sequences of calls, such as a write
+                followed by reads, are not atomic: hold the lock around them.
     """
 
     # global variables
 
     ADDRESS = 'TCPIP::{host}::INSTR'
+    TRANSPORTS = ('vxi11', 'socket')
 
-    def __init__(self, hostname):
+    # *ESR? bits: user request (front panel) and power on
+    ESR_LOCAL = 0b11000000
+
+    def __init__(self, hostname, transport='vxi11', port=None):
         """ Init.
 
         Args:
             hostname (str): ip address or DNC lookup of device
+            transport (str): vxi11|socket. vxi11 connects through pyvisa, socket
+                connects with a raw TCP socket (lower latency per message)
+            port (int|None): port for socket transport, if None use SocketTransport.PORT (5025)
         """
 
         # connect to device
-        rm = pyvisa.ResourceManager()
-        self.sds = rm.open_resource(self.ADDRESS.format(host=hostname))
+        if transport == 'vxi11':
+            rm = pyvisa.ResourceManager()
+            self.sds = rm.open_resource(self.ADDRESS.format(host=hostname))
+        elif transport == 'socket':
+            self.sds = SocketTransport(hostname, port=port)
+        else:
+            raise RuntimeError(f'transport must be one of {self.TRANSPORTS}, not "{transport}"')
 
         # setup connection
         self.sds.read_termination = '\n'
         self.sds.write_termination = '\n'
 
+        # one message at a time
+        self.lock = threading.RLock()
+
+        # queued commands while batching, per thread, see _batch
+        self._local = threading.local()
+
+        # mirror of device settings, keyed by SCPI header
+        self.cache_settings = False
+        self._settings = {}
+
+    def _get_cached(self, key, getter):
+        """Get setting from cache if enabled and known, else from the device
+
+        Args:
+            key (str): cache key, SCPI header of setting
+            getter (function): called without arguments to read setting from device
+
+        Returns:
+            value of setting
+        """
+        pending = self._pending or {}
+        cache = pending if key in pending else self._settings
+        if self.cache_settings and key in cache:
+            return cache[key]
+
+        value = getter()
+        if self.cache_settings:
+            self._settings[key] = value
+        return value
+
+    def _set_cached(self, key, value, setter):
+        """Write setting to device unless the cached value is the same
+
+        Args:
+            key (str): cache key, SCPI header of setting
+            value: value of setting, as returned by the corresponding getter
+            setter (function): called without arguments to write setting to device.
+                When batching, the cache is updated once the batch is sent without errors
+        """
+        pending = self._pending or {}
+        cache = pending if key in pending else self._settings
+        if self.cache_settings and key in cache and cache[key] == value:
+            return
+
+        setter()
+        if self.cache_settings:
+            if self.batching:
+                self._pending[key] = value
+            else:
+                self._settings[key] = value
+
+    def _invalidate(self, *keys):
+        """Remove settings from cache
+
+        Args:
+            keys (str): cache keys to remove. If none given, clear cache.
+        """
+        pending = self._pending or {}
+        if keys:
+            for key in keys:
+                self._settings.pop(key, None)
+                pending.pop(key, None)
+        else:
+            self._settings.clear()
+            pending.clear()
+
+    def check_front_panel(self):
+        """Clear the settings cache if the device was operated from the front panel.
+
+            Reads the standard event status register (*ESR?). The User Request bit
+            is set on front panel key presses, and the Power On bit after a
+            restart. Reading clears the register.
+
+        Returns:
+            bool: True if the cache was cleared
+        """
+        esr = int(float(self.query('*ESR?')))
+        if esr & self.ESR_LOCAL:
+            self.refresh()
+            return True
+        return False
+
+    def refresh(self):
+        """Clear the settings cache, such that settings are read from the device"""
+        self._invalidate()
+
+    @staticmethod
+    def _join(commands):
+        """Join commands into a single program message
+
+        Args:
+            commands (list): commands, each a str
+
+        Returns:
+            str: commands separated by ";", each from the root of the command tree
+        """
+        return ';'.join(c if c.startswith(('*', ':')) else f':{c}' for c in commands)
+
+    def _pop_batch(self, *messages):
+        """Join queued commands and messages into a single program message, and empty queue
+
+        Args:
+            messages (str): appended to the queued commands
+
+        Returns:
+            str: commands separated by ";", each from the root of the command tree
+        """
+        commands = self._batch + list(messages)
+        self._batch.clear()
+        return self._join(commands)
+
+    @property
+    def _batch(self):
+        """list|None: commands queued by batch() in this thread, None if not batching"""
+        return getattr(self._local, 'batch', None)
+
+    @_batch.setter
+    def _batch(self, value):
+        self._local.batch = value
+
+    @property
+    def _pending(self):
+        """dict|None: settings written by batch() in this thread, cached once sent"""
+        return getattr(self._local, 'pending', None)
+
+    @property
+    def batching(self):
+        """True if writes are being queued by batch()"""
+        return self._batch is not None
+
+    @contextmanager
+    def batch(self, check_errors=True, wait=True):
+        """Queue writes and send them as a single message with a single *OPC? at the end
+
+            Use as:
+
+                with device.batch():
+                    device.set_ch_scale(1, 0.5)
+                    device.set_ch_offset(1, 0)
+
+            Queries within the batch are sent together with the commands queued
+            so far. If an exception is raised within the batch, queued commands
+            are discarded. Settings written within the batch are cached once the
+            batch is sent without errors, else they are removed from the cache.
+
+        Args:
+            check_errors (bool): if True, read the error queue (SYST:ERR?) once the
+                batch is finished and raise RuntimeError if it is not empty
+            wait (bool): if False, only send the queued commands, without *OPC? and
+                SYST:ERR? (check_errors is ignored). For devices which do not support them
+        """
+
+        # nested batch: queue into the outer batch
+        if self.batching:
+            yield
+            return
+
+        self._batch = []
+        self._local.pending = {}
+        try:
+            yield
+
+            # send everything
+            errors = []
+            if not wait:
+                message = self._pop_batch()
+                self._batch = None
+                if message:
+                    with self.lock:
+                        self.sds.write(message)
+
+            # send everything, wait until finished
+            else:
+                queries = ['*OPC?', 'SYSTem:ERRor?'] if check_errors else ['*OPC?']
+                message = self._pop_batch(*queries)
+                self._batch = None
+                with self.lock:
+                    response = self.sds.query(message)
+
+                    # check for errors
+                    if check_errors:
+                        err = response.split(';')[-1]
+                        while int(err.split(',')[0]) != 0:
+                            errors.append(err.strip())
+                            err = self.sds.query('SYSTem:ERRor?')
+
+            if errors:
+                raise RuntimeError(f'Device reported errors during batch: {errors}')
+
+        # state of the device is unknown: read settings written again
+        except BaseException:
+            written = list(self._local.pending)
+            self._batch = None
+            self._local.pending = None
+            if written:
+                self._invalidate(*written)
+            raise
+
+        self._settings.update(self._local.pending)
+        self._local.pending = None
+
     # useful read and write passing to pyvisa.resources.TCPIPInstrument class
     def close(self):
         """Close remote connection."""
@@ -61,23 +287,92 @@ class SiglentBase(object):
         """
         return self.sds.read_bytes(*args, **kwargs)
 
+    def read_bytes_into(self, buffer):
+        """Read raw bytes from stream until buffer is full.
+
+        Args:
+            buffer (bytearray|memoryview|np.ndarray): writable buffer to fill
+        """
+        view = memoryview(buffer).cast('B')
+
+        if isinstance(self.sds, SocketTransport):
+            self.sds.read_bytes_into(view)
+        elif len(view) > 0:
+            view[:] = self.sds.read_bytes(len(view))
+
+    def read_block_into(self, buffer):
+        """Read IEEE 488.2 definite-length block (#<n><length><data>) into buffer.
+
+            Data beyond the size of the buffer is read and discarded. The
+            block terminator (two bytes) is consumed.
+
+        Args:
+            buffer (bytearray|memoryview|np.ndarray): writable buffer to fill
+
+        Returns:
+            int: number of bytes written to buffer
+        """
+
+        # header: skip anything preceding "#", then number of digits and length
+        head = self.read_bytes(2)
+        while head[:1] != b'#':
+            head = head[1:] + self.read_bytes(1)
+        nbytes = int(self.read_bytes(int(head[1:2])))
+
+        # data
+        view = memoryview(buffer).cast('B')
+        nread = min(nbytes, len(view))
+        self.read_bytes_into(view[:nread])
+
+        # discard data which doesn't fit, and the terminator
+        self.read_bytes(nbytes - nread + 2)
+
+        return nread
+
     def query(self, *args, **kwargs):
         """Push query to device, read back response.
 
         Arguments passed to pyvisa.TCPIPInstrument.query
         """
-        return self.sds.query(*args, **kwargs)
+        with self.lock:
+            if self._batch:
+                return self.sds.query(self._pop_batch(args[0]), *args[1:], **kwargs)
+            return self.sds.query(*args, **kwargs)
+
+    def query_many(self, messages):
+        """Send several queries as a single message, read back all responses.
+
+        Args:
+            messages (list): queries, each a str
+
+        Returns:
+            list: response to each query, in order (str)
+        """
+        return self.query(self._join(messages)).split(';')
 
     def write(self, *args, **kwargs):
         """Write string to device.
 
-        Arguments passed to pyvisa.TCPIPInstrument.write
+        Arguments passed to pyvisa.TCPIPInstrument.write. When batching,
+        the message is queued instead, unless it is a query
         """
-        return self.sds.write(*args, **kwargs)
+        if self.batching:
+            self._batch.append(args[0])
+            if '?' in args[0]:
+                with self.lock:
+                    return self.sds.write(self._pop_batch())
+            return
+
+        with self.lock:
+            return self.sds.write(*args, **kwargs)
 
     def write_raw(self, *args, **kwargs):
         """Write raw bytestring to device.
 
-        Arguments passed to pyvisa.TCPIPInstrument.write_raw
+        Arguments passed to pyvisa.TCPIPInstrument.write_raw. When batching,
+        the queued commands are sent first
         """
-        return self.sds.write_raw(*args, **kwargs)
\ No newline at end of file
+        with self.lock:
+            if self._batch:
+                self.sds.write(self._pop_batch())
+            return self.sds.write_raw(*args, **kwargs)
\ No newline at end of file
@@ -0,0 +1,213 @@
+"""
+    Raw TCP socket connection for SCPI devices
+
+    Drop-in replacement for the parts of pyvisa.resources.TCPIPInstrument used
+    by this package, without the VXI-11 RPC overhead.
+"""
+
+import socket
+
+class SocketTransport(object):
+    """Send and receive SCPI messages over a raw TCP socket
+
+        Attributes:
+
+            PORT (int): default SCPI raw socket port
+            chunk_size (int): maximum number of bytes to request from the socket at once
+            read_termination (str): termination character of responses
+            write_termination (str): appended to each written message
+            encoding (str): encoding of messages
+    """
+
+    # global variables
+
+    PORT = 5025
+
+    def __init__(self, host, port=None, timeout=2000):
+        """Init.
+
+        Args:
+            host (str): ip address or DNS lookup of device
+            port (int|None): port number, if None use PORT
+            timeout (float): timeout for socket operations in ms
+        """
+
+        if port is None:
+            port = self.PORT
+
+        # setup connection
+        self._sock = socket.create_connection((host, int(port)))
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.timeout = timeout
+
+        # received but not yet read bytes
+        self._buffer = bytearray()
+
+        self.chunk_size = 20*1024
+        self.read_termination = '\n'
+        self.write_termination = '\n'
+        self.encoding = 'ascii'
+
+    @property
+    def timeout(self):
+        """Timeout for socket operations in ms, None to block indefinitely"""
+        return self._timeout
+
+    @timeout.setter
+    def timeout(self, timeout):
+        self._timeout = timeout
+        self._sock.settimeout(None if timeout is None else timeout/1000)
+
+    def _recv(self):
+        """Receive one chunk (at most 64 kB) from the socket into the buffer"""
+        chunk = self._sock.recv(min(self.chunk_size, 65536))
+        if not chunk:
+            raise ConnectionError('Connection closed by device')
+        self._buffer += chunk
+
+    def close(self):
+        """Close remote connection."""
+        self._sock.close()
+
+    def flush(self, *args):
+        """Discard all received and unread bytes."""
+
+        self._buffer.clear()
+
+        self._sock.setblocking(False)
+        try:
+            while self._sock.recv(self.chunk_size):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+        finally:
+            self.timeout = self._timeout
+
+    def read(self, termination=None, encoding=None):
+        """Read string from device, stripped of the termination character.
+
+        Args:
+            termination (str|None): if None, use read_termination
+            encoding (str|None): if None, use encoding
+
+        Returns:
+            str: message from device
+        """
+        termination = self.read_termination if termination is None else termination
+        encoding = self.encoding if encoding is None else encoding
+
+        message = self.read_raw(termination=termination).decode(encoding)
+
+        if termination and message.endswith(termination):
+            message = message[:-len(termination)]
+
+        return message
+
+    def read_raw(self, size=None, termination=None):
+        """Read bytes from device until the termination character is found.
+
+            The data is not parsed, so binary blocks which may contain the
+            termination character should be read with read_bytes.
+
+        Args:
+            size (int|None): unused, kept for compatibility with pyvisa
+            termination (str|None): if None, use read_termination
+
+        Returns:
+            bytes: message from device, including termination character
+        """
+        termination = self.read_termination if termination is None else termination
+        term = termination.encode(self.encoding)
+
+        start = 0
+        while True:
+            idx = self._buffer.find(term, start)
+            if idx >= 0:
+                break
+            start = max(len(self._buffer) - len(term) + 1, 0)
+            self._recv()
+
+        idx += len(term)
+        data = bytes(self._buffer[:idx])
+        del self._buffer[:idx]
+        return data
+
+    def read_bytes(self, count, chunk_size=None, break_on_termchar=False):
+        """Read a fixed number of bytes from device.
+
+        Args:
+            count (int): number of bytes to read
+            chunk_size (int|None): unused, kept for compatibility with pyvisa
+            break_on_termchar (bool): unused, kept for compatibility with pyvisa
+
+        Returns:
+            bytes: message from device
+        """
+        data = bytearray(count)
+        self.read_bytes_into(data)
+        return bytes(data)
+
+    def read_bytes_into(self, buffer):
+        """Read bytes from device until buffer is full, without intermediate copies.
+
+        Args:
+            buffer (bytearray|memoryview|np.ndarray): writable buffer to fill
+        """
+        view = memoryview(buffer).cast('B')
+        count = len(view)
+
+        # already received
+        nread = min(count, len(self._buffer))
+        view[:nread] = self._buffer[:nread]
+        del self._buffer[:nread]
+
+        # straight from the socket
+        while nread < count:
+            n = self._sock.recv_into(view[nread:], min(count-nread, self.chunk_size))
+            if n == 0:
+                raise ConnectionError('Connection closed by device')
+            nread += n
+
+    def query(self, message, delay=None):
+        """Write message to device, read back response.
+
+        Args:
+            message (str): message to write
+            delay (float|None): unused, kept for compatibility with pyvisa
+
+        Returns:
+            str: response from device
+        """
+        self.write(message)
+        return self.read()
+
+    def write(self, message, termination=None, encoding=None):
+        """Write string to device.
+
+        Args:
+            message (str): message to write
+            termination (str|None): if None, use write_termination
+            encoding (str|None): if None, use encoding
+
+        Returns:
+            int: number of bytes written
+        """
+        termination = self.write_termination if termination is None else termination
+        encoding = self.encoding if encoding is None else encoding
+
+        if termination and not message.endswith(termination):
+            message += termination
+
+        return self.write_raw(message.encode(encoding))
+
+    def write_raw(self, message):
+        """Write raw bytestring to device.
+
+        Args:
+            message (bytes): message to write
+
+        Returns:
+            int: number of bytes written
+        """
+        self._sock.sendall(message)
+        return len(message)
@@ -0,0 +1,406 @@
+"""
+    Calculate the SDS5034 measurement items on the host from waveforms
+
+    Waveforms are measured along the last axis, so a single waveform, the
+    channels of read_wave_active, or the frames of read_wave_sequence are all
+    measured at once without a loop in python. Use as:
+
+        meas = WaveMeasure()
+        time_s, volts = sds.read_wave_sequence(1)
+        values = meas.measure(volts, dt=time_s[1]-time_s[0], t0=time_s[0])
+        values['FREQ']      # frequency of each frame
+
+    Thresholds follow the scope defaults: top and base are the most common
+    levels in the upper and lower half of the waveform, edges are qualified
+    by crossing both the low (10%) and high (90%) thresholds, and edge times
+    are taken at the mid (50%) threshold.
+"""
+
+import numpy as np
+import pandas as pd
+from .SDS5034 import SDS5034
+from .Waveform import Waveform
+
+class WaveMeasure(object):
+    """Calculate measurement items of waveforms in numpy
+
+        Edge times are linearly interpolated between points. Items which need a
+        full cycle use the whole cycles between the first and last rising edge
+        (CMEAN, VSTD, CRMS, CMEDIAN and the AC areas). PER, FREQ, PWID, NWID,
+        DUTY, NDUTY, RISE and FALL are those of the first cycle or edge, as on
+        the scope. The period is between rising edges, or falling edges if there
+        is only one rising edge. Items which cannot be found (ex: no edges) are nan.
+
+        Attributes:
+
+            ITEMS (list): measurement items, same as SDS5034.MEASUREMENT_ITEMS
+            NOT_CALCULATED (tuple): items which are always nan, as they depend on
+                settings of the scope which are not known here
+            high (float): high threshold in percent of amplitude
+            mid (float): mid threshold in percent of amplitude
+            low (float): low threshold in percent of amplitude
+            nbins (int): number of histogram bins used to find top and base
+    """
+
+    ITEMS = SDS5034.MEASUREMENT_ITEMS
+    NOT_CALCULATED = ('TIMEL', 'NBWID')
+
+    def __init__(self, high=90, mid=50, low=10, nbins=256):
+        """ Init.
+
+        Args:
+            high (float): high threshold in percent of amplitude
+            mid (float): mid threshold in percent of amplitude
+            low (float): low threshold in percent of amplitude
+            nbins (int): number of histogram bins used to find top and base
+        """
+        if not low < mid < high:
+            raise RuntimeError(f'Thresholds must be low < mid < high, not {low}, {mid}, {high}')
+
+        self.high = high
+        self.mid = mid
+        self.low = low
+        self.nbins = nbins
+
+    def measure(self, data, items=None, dt=None, t0=0):
+        """Calculate measurement items
+
+        Args:
+            data (np.ndarray|pd.DataFrame|Waveform): waveforms to measure
+                np.ndarray: voltages, measured along the last axis, ex: shape
+                    (n_points,), (n_channels, n_points) or (n_frames, n_points)
+                pd.DataFrame: as returned by read_wave_ch or read_wave_active, each
+                    column is measured. dt and t0 are taken from the index.
+                Waveform: as returned by read_wave_ch with raw=True
+            items (str|list|None): item(s) from ITEMS, case insensitive. If None, all ITEMS
+            dt (float|None): time between points in seconds, needed for np.ndarray
+            t0 (float): time of the first point relative to the trigger in seconds
+
+        Returns:
+            Value(s) for each waveform, indexed by item if items is a list or None
+                np.ndarray input:   np.ndarray of shape data.shape[:-1], or dict of these
+                pd.DataFrame input: pd.Series indexed by column, or pd.DataFrame with
+                                    one row per column and one column per item
+                Waveform input:     float, or dict of float
+        """
+
+        single = isinstance(items, str)
+        if items is None:
+            items = self.ITEMS
+        elif single:
+            items = [items]
+        items = [SDS5034.MEASUREMENT_INDEX.get(item.lower(), item) for item in items]
+
+        for item in items:
+            if item not in self.ITEMS:
+                raise RuntimeError(f'Measurement item "{item}" not found. Must be one of {self.ITEMS}')
+
+        # get voltages and time axis
+        if isinstance(data, pd.DataFrame):
+            volts = data.values.T
+            if 'dt' in data.attrs:
+                t0 = data.attrs['t0']
+                dt = data.attrs['dt']
+            else:
+                t0 = data.index[0]
+                dt = data.index[1] - data.index[0]
+
+        elif isinstance(data, Waveform):
+            volts = data.volts()
+            t0 = data.t0
+            dt = data.dt
+
+        else:
+            volts = np.asarray(data, dtype=float)
+            if dt is None:
+                raise RuntimeError('dt is needed to measure a np.ndarray')
+
+        # measure as 2d
+        shape = volts.shape[:-1]
+        values = self._measure(volts.reshape(-1, volts.shape[-1]), items, dt, t0)
+        values = {item: values[item].reshape(shape) for item in items}
+
+        # format output
+        if isinstance(data, pd.DataFrame):
+            df = pd.DataFrame(values, index=data.columns)
+            return df[items[0]] if single else df
+
+        if not shape:
+            values = {item: float(val) for item, val in values.items()}
+
+        return values[items[0]] if single else values
+
+    def _measure(self, volts, items, dt, t0):
+        """Calculate items of 2d voltages, shape (n_waveforms, n_points)
+
+        Returns:
+            dict: np.ndarray of shape (n_waveforms,) for each item
+        """
+        items = set(items)
+        nrows, npts = volts.shape
+        rows = np.arange(nrows)
+        out = {}
+
+        vmax = volts.max(axis=1)
+        vmin = volts.min(axis=1)
+        top, base = self._top_base(volts, vmin, vmax)
+        ampl = top - base
+        ampl_pc = np.where(ampl > 0, ampl, np.nan) / 100
+
+        out['PKPK'] = vmax - vmin
+        out['MAX'] = vmax
+        out['MIN'] = vmin
+        out['TOP'] = top
+        out['BASE'] = base
+        out['AMPL'] = ampl
+        out['MEAN'] = volts.mean(axis=1)
+        out['STDEV'] = volts.std(axis=1)
+        out['RMS'] = np.sqrt(np.mean(volts**2, axis=1))
+        out['OVSP'] = (vmax - top) / ampl_pc
+        out['FPRE'] = out['OVSP']
+        out['OVSN'] = (base - vmin) / ampl_pc
+        out['RPRE'] = out['OVSN']
+        out['TMAX'] = t0 + volts.argmax(axis=1) * dt
+        out['TMIN'] = t0 + volts.argmin(axis=1) * dt
+
+        for item in self.NOT_CALCULATED:
+            out[item] = np.full(nrows, np.nan)
+
+        if 'MEDIAN' in items:
+            out['MEDIAN'] = np.median(volts, axis=1)
+
+        # value at the trigger
+        pos = -t0 / dt
+        if 0 <= pos <= npts-1:
+            i = min(int(pos), npts-2) if npts > 1 else 0
+            frac = pos - i
+            out['LEVELX'] = volts[:, i] * (1-frac) + volts[:, min(i+1, npts-1)] * frac
+        else:
+            out['LEVELX'] = np.full(nrows, np.nan)
+
+        # areas
+        positive = np.clip(volts, 0, None)
+        negative = np.clip(volts, None, 0)
+        out['PAREA'] = positive.sum(axis=1) * dt
+        out['NAREA'] = negative.sum(axis=1) * dt
+        out['AREA'] = out['PAREA'] + out['NAREA']
+        out['ABSAREA'] = out['PAREA'] - out['NAREA']
+
+        # everything else needs edges
+        if items.issubset(out.keys()):
+            return out
+
+        levels = {name: base + ampl * pc / 100 for name, pc in (('low', self.low),
+                                                                ('mid', self.mid),
+                                                                ('high', self.high),
+                                                                ('20', 20),
+                                                                ('80', 80))}
+        rise, fall = self._edges(volts, levels['low'], levels['high'])
+
+        # edge times at mid threshold, as fractional point number
+        rise_mid = self._crossing(volts, rise, levels['mid'], rising=True)
+        fall_mid = self._crossing(volts, fall, levels['mid'], rising=False)
+
+        nrise = np.bincount(rise[0], minlength=nrows)
+        nfall = np.bincount(fall[0], minlength=nrows)
+        rise_start = np.concatenate(([0], np.cumsum(nrise)[:-1]))
+        fall_start = np.concatenate(([0], np.cumsum(nfall)[:-1]))
+
+        def nth(times, start, count, n):
+            """n-th edge of each row, nan if there is none"""
+            n = np.broadcast_to(n, (nrows, ))
+            ok = (n >= 0) & (n < count)
+            val = np.full(nrows, np.nan)
+            val[ok] = times[start[ok] + n[ok]]
+            return val
+
+        def after(times, edge_rows, pos):
+            """first edge of each row after pos, nan if there is none"""
+            keys = edge_rows * (npts+1) + times
+            ok = ~np.isnan(pos)
+            target = rows[ok] * (npts+1) + pos[ok]
+            idx = np.searchsorted(keys, target, side='right')
+            val = np.full(nrows, np.nan)
+            found = idx < len(keys)
+            idx = idx[found]
+            same_row = edge_rows[idx] == rows[ok][found]
+            sub = np.flatnonzero(ok)[found][same_row]
+            val[sub] = times[idx[same_row]]
+            return val
+
+        r0 = nth(rise_mid, rise_start, nrise, 0)
+        r1 = nth(rise_mid, rise_start, nrise, 1)
+        r2 = nth(rise_mid, rise_start, nrise, 2)
+        f0 = nth(fall_mid, fall_start, nfall, 0)
+        rlast = nth(rise_mid, rise_start, nrise, nrise-1)
+        flast = nth(fall_mid, fall_start, nfall, nfall-1)
+
+        f1 = nth(fall_mid, fall_start, nfall, 1)
+
+        # timing of first cycle, between falling edges if there are not two rising edges
+        per = np.where(np.isnan(r1), f1 - f0, r1 - r0) * dt
+        pwid = (after(fall_mid, fall[0], r0) - r0) * dt
+        nwid = (after(rise_mid, rise[0], f0) - f0) * dt
+
+        out['PER'] = per
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out['FREQ'] = 1 / per
+        out['PWID'] = pwid
+        out['NWID'] = nwid
+        out['DUTY'] = pwid / per * 100
+        out['NDUTY'] = nwid / per * 100
+        out['CCJ'] = ((r2 - r1) - (r1 - r0)) * dt
+
+        # first and last edge of either direction
+        first = np.fmin(r0, f0)
+        last = np.fmax(rlast, flast)
+        out['DELAY'] = t0 + first * dt
+        out['WID'] = (last - first) * dt
+
+        # transition times of first edges
+        def transition(edges, counts, start, lo, hi, rising):
+            t_lo = self._crossing(volts, edges, levels[lo], rising=rising)
+            t_hi = self._crossing(volts, edges, levels[hi], rising=rising)
+            return nth(np.abs(t_hi - t_lo), start, counts, 0) * dt
+
+        for item, args in (('RISE', (rise, nrise, rise_start, 'low', 'high', True)),
+                           ('FALL', (fall, nfall, fall_start, 'low', 'high', False)),
+                           ('RISE20T80', (rise, nrise, rise_start, '20', '80', True)),
+                           ('FALL80T20', (fall, nfall, fall_start, '20', '80', False))):
+            if item in items:
+                out[item] = transition(*args)
+
+        # edge counts
+        out['REDGES'] = nrise.astype(float)
+        out['FEDGES'] = nfall.astype(float)
+        out['EDGES'] = (nrise + nfall).astype(float)
+        out['CYCLES'] = np.clip(nrise-1, 0, None).astype(float)
+        out['PPULSES'] = nfall - np.bincount(fall[0][fall_mid < r0[fall[0]]], minlength=nrows)
+        out['PPULSES'] = out['PPULSES'].astype(float)
+        out['NPULSES'] = nrise - np.bincount(rise[0][rise_mid < f0[rise[0]]], minlength=nrows)
+        out['NPULSES'] = out['NPULSES'].astype(float)
+        out['PPULSES'][np.isnan(r0)] = 0
+        out['NPULSES'][np.isnan(f0)] = 0
+
+        # whole cycles between first and last rising edge
+        if items & {'CMEAN', 'VSTD', 'CRMS', 'CMEDIAN', 'PACArea', 'NACArea', 'ACArea', 'ABSACArea'}:
+            idx = np.arange(npts)
+            ok = nrise >= 2
+            mask = (idx >= np.ceil(r0)[:, None]) & (idx < np.ceil(rlast)[:, None]) & ok[:, None]
+            count = mask.sum(axis=1)
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                cmean = np.where(mask, volts, 0).sum(axis=1) / count
+                out['CMEAN'] = cmean
+                out['VSTD'] = np.sqrt(np.where(mask, (volts-cmean[:, None])**2, 0).sum(axis=1) / count)
+                out['CRMS'] = np.sqrt(np.where(mask, volts**2, 0).sum(axis=1) / count)
+
+            out['PACArea'] = np.where(mask, positive, 0).sum(axis=1) * dt
+            out['NACArea'] = np.where(mask, negative, 0).sum(axis=1) * dt
+            out['ACArea'] = out['PACArea'] + out['NACArea']
+            out['ABSACArea'] = out['PACArea'] - out['NACArea']
+            for item in ('PACArea', 'NACArea', 'ACArea', 'ABSACArea'):
+                out[item][~ok] = np.nan
+
+            if 'CMEDIAN' in items:
+                ordered = np.sort(np.where(mask, volts, np.inf), axis=1)
+                lo = np.clip((count-1) // 2, 0, None)
+                hi = np.clip(count // 2, 0, None)
+                out['CMEDIAN'] = (ordered[rows, lo] + ordered[rows, hi]) / 2
+                out['CMEDIAN'][~ok] = np.nan
+
+        return out
+
+    def _top_base(self, volts, vmin, vmax):
+        """Most common level in the upper and lower half of each waveform
+
+            Falls back to the maximum or minimum if the mode of a half is not
+            more common than the extreme value.
+
+        Returns:
+            tuple: (top, base) np.ndarray of shape (n_waveforms,)
+        """
+        nrows = len(volts)
+        nbins = self.nbins
+        span = vmax - vmin
+        scale = np.where(span > 0, (nbins-1) / np.where(span > 0, span, 1), 0)
+
+        # histogram of each row
+        bins = ((volts - vmin[:, None]) * scale[:, None]).astype(np.intp)
+        bins += np.arange(nrows)[:, None] * nbins
+        hist = np.bincount(bins.ravel(), minlength=nrows*nbins).reshape(nrows, nbins)
+
+        half = nbins // 2
+        itop = half + hist[:, half:].argmax(axis=1)
+        ibase = hist[:, :half].argmax(axis=1)
+
+        width = np.where(span > 0, span / (nbins-1), 0)
+        top = vmin + itop * width
+        base = vmin + ibase * width
+
+        # no clear mode, ex: triangle wave
+        rows = np.arange(nrows)
+        top = np.where(hist[rows, itop] > hist[:, -1], top, vmax)
+        base = np.where(hist[rows, ibase] > hist[:, 0], base, vmin)
+        return (top, base)
+
+    @staticmethod
+    def _edges(volts, low, high):
+        """Find edges which cross both the low and high thresholds
+
+        Args:
+            volts (np.ndarray): shape (n_waveforms, n_points)
+            low, high (np.ndarray): thresholds of each waveform
+
+        Returns:
+            tuple: (rise, fall), each (rows, points) of np.nonzero. points is the
+                first point past the threshold which completes the edge
+        """
+        npts = volts.shape[1]
+
+        # state with hysteresis: 1 above high, 0 below low, previous state in between
+        state = np.full(volts.shape, -1, dtype=np.int8)
+        state[volts <= low[:, None]] = 0
+        state[volts >= high[:, None]] = 1
+
+        idx = np.where(state >= 0, np.arange(npts), 0)
+        np.maximum.accumulate(idx, axis=1, out=idx)
+        state = np.take_along_axis(state, idx, axis=1)
+
+        rise = np.nonzero((state[:, 1:] == 1) & (state[:, :-1] == 0))
+        fall = np.nonzero((state[:, 1:] == 0) & (state[:, :-1] == 1))
+        return ((rise[0], rise[1]+1), (fall[0], fall[1]+1))
+
+    @staticmethod
+    def _crossing(volts, edges, level, rising):
+        """Interpolated point number of the last crossing of level before each edge
+
+        Args:
+            volts (np.ndarray): shape (n_waveforms, n_points)
+            edges (tuple): (rows, points) from _edges
+            level (np.ndarray): level of each waveform
+            rising (bool): direction of the edges
+
+        Returns:
+            np.ndarray: fractional point number of each edge
+        """
+        rows, points = edges
+        npts = volts.shape[1]
+
+        # all crossings, as points k with level between k and k+1
+        if rising:
+            before = volts < level[:, None]
+        else:
+            before = volts > level[:, None]
+        cross_rows, cross_points = np.nonzero(before[:, :-1] & ~before[:, 1:])
+
+        # last crossing before each edge
+        idx = np.searchsorted(cross_rows*npts + cross_points, rows*npts + points) - 1
+        k = cross_points[np.clip(idx, 0, None)] if len(cross_points) else np.zeros_like(points)
+
+        v0 = volts[rows, k]
+        v1 = volts[rows, k+1]
+        lv = level[rows]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            frac = np.where(v1 != v0, (lv - v0) / (v1 - v0), 0)
+        return k + np.clip(frac, 0, 1)
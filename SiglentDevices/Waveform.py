@@ -0,0 +1,218 @@
+"""
+    Waveform of a single oscilloscope channel as raw adc codes
+
+    Keeps the codes as transferred (1 or 2 bytes per point) together with the
+    scaling from the waveform preamble, converting to volts only when asked.
+"""
+
+import numpy as np
+import pandas as pd
+import math
+
+class Waveform(object):
+    """ADC codes of a single channel waveform, converted to volts on demand
+
+        volts = codes / code_per_div * v_per_div - v_offset, where codes are
+        in units of 8 bit adc codes (10 bit codes are divided by 4)
+
+        Attributes:
+
+            ch (int): channel number
+            codes (np.ndarray): signed adc codes, int8 for 8 bit or int16 for 10 bit
+            nbits (int): adc resolution in bits 8|10
+            code_per_div (float): adc codes per vertical division
+            v_per_div (float): vertical scale with probe attenuation
+            v_offset (float): vertical offset with probe attenuation
+            t0 (float): time of the first point relative to the trigger in seconds
+            dt (float): time between points in seconds
+    """
+
+    def __init__(self, ch, codes, nbits, code_per_div, v_per_div, v_offset, t0=0, dt=1):
+        """ Init.
+
+        Args:
+            ch (int): channel number
+            codes (np.ndarray): signed adc codes
+            nbits (int): adc resolution in bits 8|10
+            code_per_div (float): adc codes per vertical division (see preamble)
+            v_per_div (float): vertical scale with probe attenuation (see preamble)
+            v_offset (float): vertical offset with probe attenuation (see preamble)
+            t0 (float): time of the first point relative to the trigger in seconds
+            dt (float): time between points in seconds
+        """
+        self.ch = ch
+        self.codes = codes
+        self.nbits = nbits
+        self.code_per_div = code_per_div
+        self.v_per_div = v_per_div
+        self.v_offset = v_offset
+        self.t0 = t0
+        self.dt = dt
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __repr__(self):
+        return f'Waveform(C{self.ch}, {len(self)} points, {self.nbits} bit)'
+
+    @staticmethod
+    def to_volts(codes, nbits, code_per_div, v_per_div, v_offset, dtype=np.float64):
+        """Convert adc codes to volts
+
+        Args:
+            codes (np.ndarray): signed adc codes
+            nbits (int): adc resolution in bits 8|10
+            code_per_div (float): adc codes per vertical division (see preamble)
+            v_per_div (float): vertical scale with probe attenuation (see preamble)
+            v_offset (float): vertical offset with probe attenuation (see preamble)
+            dtype (np.dtype): floating point type of output
+
+        Returns:
+            np.ndarray: voltages in volts
+        """
+        volts = codes.astype(dtype)
+
+        if nbits == 10:
+            volts /= 4
+
+        volts /= code_per_div
+        volts *= v_per_div
+        volts -= v_offset
+
+        return volts
+
+    @property
+    def time(self):
+        """np.ndarray: time of each point relative to the trigger in seconds"""
+        return self.t0 + np.arange(len(self)) * self.dt
+
+    def envelope(self, tmin=None, tmax=None, nbins=2000):
+        """Min/max envelope of the waveform, for plotting
+
+            The points between tmin and tmax are split into nbins buckets, and
+            the minimum and maximum of each bucket are kept, in time order. This
+            preserves peaks and glitches which plain downsampling would miss.
+            Only the kept points are converted to volts.
+
+        Args:
+            tmin (float|None): start time in seconds, if None start from the first point
+            tmax (float|None): stop time in seconds, if None stop at the last point
+            nbins (int): number of buckets, ex: width of the plot in pixels
+
+        Returns:
+            tuple: (time, volts) np.ndarray of at most 2*(nbins+1) points
+        """
+        n = len(self)
+
+        # index range
+        i0 = 0 if tmin is None else int(np.clip(math.floor((tmin - self.t0) / self.dt), 0, n))
+        i1 = n if tmax is None else int(np.clip(math.ceil((tmax - self.t0) / self.dt) + 1, i0, n))
+        codes = self.codes[i0:i1]
+        npts = len(codes)
+
+        if npts <= 2*nbins:
+            idx = np.arange(i0, i1)
+
+        else:
+            bucket = math.ceil(npts / nbins)
+            nfull = npts // bucket
+
+            # min and max of each full bucket, in time order
+            rows = codes[:nfull*bucket].reshape(nfull, bucket)
+            imin = rows.argmin(axis=1)
+            imax = rows.argmax(axis=1)
+            idx = np.stack((np.minimum(imin, imax), np.maximum(imin, imax)), axis=1)
+            idx += np.arange(0, nfull*bucket, bucket)[:, None]
+            idx = idx.ravel()
+
+            # remaining points
+            if nfull*bucket < npts:
+                tail = codes[nfull*bucket:]
+                itail = sorted((tail.argmin(), tail.argmax()))
+                idx = np.concatenate((idx, np.array(itail) + nfull*bucket))
+
+            idx += i0
+
+        volts = self.to_volts(self.codes[idx], self.nbits,
+                              code_per_div=self.code_per_div,
+                              v_per_div=self.v_per_div,
+                              v_offset=self.v_offset)
+        return (self.t0 + idx * self.dt, volts)
+
+    def volts(self, dtype=np.float64):
+        """Convert codes to volts
+
+        Args:
+            dtype (np.dtype): floating point type of output
+
+        Returns:
+            np.ndarray: voltages in volts
+        """
+        return self.to_volts(self.codes, self.nbits,
+                             code_per_div=self.code_per_div,
+                             v_per_div=self.v_per_div,
+                             v_offset=self.v_offset,
+                             dtype=dtype)
+
+    def index(self, time_index=True):
+        """Index for a DataFrame of the waveform
+
+        Args:
+            time_index (bool): if True, time of each point in seconds (time_s). If
+                False, point number (RangeIndex), which does not allocate an array
+
+        Returns:
+            pd.Index: index
+        """
+        if time_index:
+            return pd.Index(self.time, name='time_s')
+        return pd.RangeIndex(len(self), name='point')
+
+    def to_frame(self, dtype=np.float64, time_index=True):
+        """Convert codes to volts
+
+        Args:
+            dtype (np.dtype): floating point type of voltages
+            time_index (bool): if True, index by time in seconds. If False, index by
+                point number and keep the time axis as t0 and dt in df.attrs
+
+        Returns:
+            pd.DataFrame: voltages
+        """
+        return self.join([self], [self.volts(dtype)], time_index=time_index)
+
+    @staticmethod
+    def join(waves, volts=None, time_index=True):
+        """Combine waveforms of several channels into a single DataFrame
+
+            Channels with the same time axis are joined by position, without
+            aligning indexes. Otherwise the channels are aligned on time, which
+            requires time_index.
+
+        Args:
+            waves (list): Waveform of each channel
+            volts (list|None): voltages of each channel, if already converted
+            time_index (bool): if True, index by time in seconds. If False, index by
+                point number and keep the time axis as t0 and dt in df.attrs
+
+        Returns:
+            pd.DataFrame: voltages of each channel
+        """
+        if volts is None:
+            volts = [wave.volts() for wave in waves]
+
+        # common time axis: join by position
+        first = waves[0]
+        if all((len(w), w.t0, w.dt) == (len(first), first.t0, first.dt) for w in waves):
+            df = pd.DataFrame({f'C{w.ch}': v for w, v in zip(waves, volts)},
+                              index=first.index(time_index), copy=False)
+            if not time_index:
+                df.attrs.update(t0=first.t0, dt=first.dt)
+            return df
+
+        # align on time
+        if not time_index:
+            raise RuntimeError('Waveforms have different time axes, cannot index by point number. Use time_index=True')
+        frames = [pd.DataFrame({f'C{w.ch}': v}, index=w.index(), copy=False)
+                  for w, v in zip(waves, volts)]
+        return pd.concat(frames, axis='columns')
@@ -0,0 +1,156 @@
+"""
+    Storage of the waveforms read by SDS5034
+
+    WaveformStore keeps nothing, LatestStore keeps the last waveform of each
+    channel, and RingStore keeps the last N waveforms of each channel in
+    preallocated arrays. Assign to SDS5034.store:
+
+        sds.store = RingStore(depth=100, max_bytes_per_ch=125e6)
+"""
+
+import numpy as np
+import pandas as pd
+from .Waveform import Waveform
+
+class WaveformStore(object):
+    """Keep no waveforms. Base class for waveform stores"""
+
+    def put(self, wave):
+        """Store waveform
+
+        Args:
+            wave (Waveform): waveform of a single channel
+        """
+        pass
+
+    def channels(self):
+        """Returns:
+            list: channel numbers with stored waveforms
+        """
+        return []
+
+    def latest(self, ch):
+        """Args:
+            ch (int): channel number
+
+        Returns:
+            Waveform|None: last stored waveform of the channel, None if there is none
+        """
+        return None
+
+    def clear(self):
+        """Remove all stored waveforms"""
+        pass
+
+    def to_frame(self, time_index=True):
+        """Get the last waveform of each channel in volts
+
+        Args:
+            time_index (bool): if True, index by timestamp, else by point number
+
+        Returns:
+            pd.DataFrame: voltages of all stored channels
+        """
+        waves = [self.latest(ch) for ch in self.channels()]
+        if not waves:
+            return pd.DataFrame()
+        return Waveform.join(waves, time_index=time_index)
+
+class LatestStore(WaveformStore):
+    """Keep the last waveform of each channel"""
+
+    def __init__(self):
+        self._waves = {}
+
+    def put(self, wave):
+        self._waves[wave.ch] = wave
+
+    def channels(self):
+        return sorted(self._waves.keys())
+
+    def latest(self, ch):
+        return self._waves.get(int(ch), None)
+
+    def clear(self):
+        self._waves.clear()
+
+class RingStore(WaveformStore):
+    """Keep the last waveforms of each channel in preallocated ring buffers
+
+        Codes are copied into the buffer of each channel, which is reallocated
+        (discarding its history) if the number of points or adc resolution
+        changes. Waveforms returned by latest and history are views of the
+        buffer, and are overwritten after depth more waveforms are stored.
+
+        Attributes:
+
+            depth (int): maximum number of waveforms kept per channel
+            max_bytes_per_ch (float): maximum size of the buffer of each channel in
+                bytes, the total is up to this times the number of channels. If
+                needed, fewer than depth waveforms are kept.
+    """
+
+    def __init__(self, depth=16, max_bytes_per_ch=256*2**20):
+        """ Init.
+
+        Args:
+            depth (int): maximum number of waveforms kept per channel
+            max_bytes_per_ch (float): maximum size of the buffer of each channel in bytes
+        """
+        self.depth = int(depth)
+        self.max_bytes_per_ch = max_bytes_per_ch
+        self._buffers = {}  # codes, shape (depth, npts)
+        self._waves = {}    # Waveform in each slot
+        self._count = {}    # number of waveforms stored
+
+    def put(self, wave):
+        ch = wave.ch
+        buffer = self._buffers.get(ch, None)
+
+        # allocate, within memory limit
+        if buffer is None or buffer.shape[1] != len(wave) or buffer.dtype != wave.codes.dtype:
+            nbytes = max(len(wave) * wave.codes.itemsize, 1)
+            depth = int(max(min(self.depth, self.max_bytes_per_ch // nbytes), 1))
+            buffer = np.empty((depth, len(wave)), dtype=wave.codes.dtype)
+            self._buffers[ch] = buffer
+            self._waves[ch] = [None]*depth
+            self._count[ch] = 0
+
+        # copy into next slot
+        slot = self._count[ch] % len(buffer)
+        buffer[slot] = wave.codes
+        self._waves[ch][slot] = Waveform(ch, buffer[slot], wave.nbits,
+                                         code_per_div=wave.code_per_div,
+                                         v_per_div=wave.v_per_div,
+                                         v_offset=wave.v_offset,
+                                         t0=wave.t0,
+                                         dt=wave.dt)
+        self._count[ch] += 1
+
+    def channels(self):
+        return sorted(self._buffers.keys())
+
+    def latest(self, ch):
+        ch = int(ch)
+        if not self._count.get(ch, 0):
+            return None
+        return self._waves[ch][(self._count[ch]-1) % len(self._buffers[ch])]
+
+    def history(self, ch):
+        """Args:
+            ch (int): channel number
+
+        Returns:
+            list: stored waveforms of the channel, oldest first
+        """
+        ch = int(ch)
+        count = self._count.get(ch, 0)
+        if not count:
+            return []
+        depth = len(self._buffers[ch])
+        return [self._waves[ch][i % depth] for i in range(max(count-depth, 0), count)]
+
+    def clear(self):
+        self._buffers.clear()
+        self._waves.clear()
+        self._count.clear()
@@ -0,0 +1,291 @@
+"""
+    Stream waveforms to disk as they are transferred from SDS5034
+
+    Each waveform is appended as a row of adc codes to a per-channel dataset,
+    piece by piece, so it is never held whole in memory. The scaling and time
+    axis of each row are stored alongside. Use as:
+
+        with NpyWriter('run1') as writer:
+            for i in range(1000):
+                sds.record_wave_active(writer)
+
+    and read back with:
+
+        codes = np.load('run1/C1.npy', mmap_mode='r')
+        scale = np.load('run1/C1_scale.npy')
+        volts = Waveform.to_volts(codes[0], scale['nbits'][0], scale['code_per_div'][0],
+                                  scale['v_per_div'][0], scale['v_offset'][0])
+
+    HDF5Writer stores the same in a single file, and requires h5py.
+"""
+
+import os, json
+import abc
+import numpy as np
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+class WaveformWriter(abc.ABC):
+    """Base class for writing waveforms piece by piece
+
+        Subclasses implement _append(ch, name, data, dtype, width), which appends
+        rows to a dataset.
+
+        Attributes:
+
+            SCALE_DTYPE (np.dtype): scaling and time axis of each waveform. npts is
+                the number of points received, fewer than the length of the row if
+                the transfer failed (see abort)
+            nrecords (dict): number of waveforms written for each channel
+    """
+
+    SCALE_DTYPE = np.dtype([('t0', 'f8'),
+                            ('dt', 'f8'),
+                            ('code_per_div', 'f8'),
+                            ('v_per_div', 'f8'),
+                            ('v_offset', 'f8'),
+                            ('nbits', 'i2'),
+                            ('npts', 'i8')])
+
+    def __init__(self):
+        self.nrecords = {}
+        self._open = {}     # number of points written to the current record, by channel
+        self._width = {}    # (npts, dtype) of the current record, by channel
+        self._scale = {}    # SCALE_DTYPE of the current record, by channel
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def start(self, wave, npts, preamble):
+        """Start a new waveform
+
+        Args:
+            wave (Waveform): scaling and time axis of the waveform, codes are not used
+                except for their type
+            npts (int): number of points which will be written
+            preamble (dict): waveform preamble
+        """
+        ch = wave.ch
+        if ch in self._open:
+            raise RuntimeError(f'Waveform of C{ch} already started')
+
+        scale = np.array([(wave.t0, wave.dt, wave.code_per_div, wave.v_per_div,
+                           wave.v_offset, wave.nbits, npts)], dtype=self.SCALE_DTYPE)
+
+        if self.nrecords.get(ch, 0) == 0:
+            self._first(ch, preamble)
+
+        self._scale[ch] = scale
+        self._width[ch] = (int(npts), wave.codes.dtype)
+        self._open[ch] = 0
+
+    def write(self, ch, codes):
+        """Append piece of the current waveform
+
+        Args:
+            ch (int): channel number
+            codes (np.ndarray): adc codes
+        """
+        npts, dtype = self._width[ch]
+        self._append(ch, 'codes', codes, dtype, npts)
+        self._open[ch] += len(codes)
+
+    def finish(self, ch):
+        """Finish the current waveform, padding with zeros if fewer than npts were written
+
+        Args:
+            ch (int): channel number
+        """
+        npts, dtype = self._width[ch]
+        nwritten = self._open.pop(ch)
+        if nwritten < npts:
+            self._append(ch, 'codes', np.zeros(npts-nwritten, dtype=dtype), dtype, npts)
+
+        scale = self._scale.pop(ch)
+        scale['npts'] = min(nwritten, npts)
+        self._append(ch, 'scale', scale, self.SCALE_DTYPE, None)
+        self.nrecords[ch] = self.nrecords.get(ch, 0) + 1
+
+    def abort(self, ch):
+        """Finish the current waveform after a failed transfer, if one is started
+
+            The points received are kept and the rest of the row is zeros. The
+            record is marked incomplete by npts of its scale.
+
+        Args:
+            ch (int): channel number
+        """
+        if ch in self._open:
+            self.finish(ch)
+
+    def close(self):
+        """Close all files"""
+        pass
+
+    def _first(self, ch, preamble):
+        """Called at the start of the first waveform of a channel"""
+        pass
+
+    @abc.abstractmethod
+    def _append(self, ch, name, data, dtype, width):
+        """Append data to dataset
+
+        Args:
+            ch (int): channel number
+            name (str): codes|scale
+            data (np.ndarray): data to append
+            dtype (np.dtype): type of dataset
+            width (int|None): length of each row for codes, None for scale (1d)
+        """
+
+class NpyWriter(WaveformWriter):
+    """Write waveforms to growable .npy files which can be memory mapped
+
+        Files in directory, for each channel:
+
+            C<n>.npy:               adc codes, shape (nrecords, npts)
+            C<n>_scale.npy:         SCALE_DTYPE for each record, shape (nrecords, )
+            C<n>_preamble.json:     preamble of the first record
+
+        The array header is updated each time a record is finished, so the files
+        can be read while recording.
+    """
+
+    # reserved for the header, such that it can be rewritten as the shape grows
+    HEADER_BYTES = 256
+
+    def __init__(self, directory):
+        """ Init.
+
+        Args:
+            directory (str): path to directory, created if needed. Existing files are overwritten
+        """
+        super().__init__()
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._files = {}    # (file, dtype, width, nbytes written), by (ch, name)
+
+    def _path(self, ch, name):
+        suffix = '' if name == 'codes' else f'_{name}'
+        return os.path.join(self.directory, f'C{ch}{suffix}.npy')
+
+    def _first(self, ch, preamble):
+        with open(os.path.join(self.directory, f'C{ch}_preamble.json'), 'w') as fid:
+            json.dump(preamble, fid, indent=4)
+
+    def _write_header(self, fid, dtype, shape):
+        """Write .npy header (version 1.0) of fixed length at the start of the file"""
+        header = repr({'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)),
+                       'fortran_order': False,
+                       'shape': shape})
+        header = header.encode('latin1')
+        nheader = self.HEADER_BYTES - 10
+        if len(header) >= nheader:
+            raise RuntimeError('npy header too long')
+
+        fid.seek(0)
+        fid.write(b'\x93NUMPY\x01\x00')
+        fid.write(np.uint16(nheader).tobytes())
+        fid.write(header.ljust(nheader-1) + b'\n')
+        fid.seek(0, os.SEEK_END)
+
+    def _append(self, ch, name, data, dtype, width):
+        key = (ch, name)
+        if key not in self._files:
+            fid = open(self._path(ch, name), 'wb+')
+            self._write_header(fid, dtype, (0, width) if width else (0, ))
+            self._files[key] = [fid, np.dtype(dtype), width, 0]
+
+        entry = self._files[key]
+        fid, dtype = entry[:2]
+
+        if width != entry[2]:
+            raise RuntimeError(f'Number of points of C{ch} changed from {entry[2]} to {width}')
+
+        data = np.ascontiguousarray(data, dtype=dtype)
+        fid.write(data)
+        entry[3] += data.nbytes
+
+        # update shape on complete rows
+        nitems = entry[3] // dtype.itemsize
+        if width is None:
+            self._write_header(fid, dtype, (nitems, ))
+        elif nitems % width == 0:
+            self._write_header(fid, dtype, (nitems // width, width))
+
+    def close(self):
+        for fid, *_ in self._files.values():
+            fid.close()
+        self._files.clear()
+
+class HDF5Writer(WaveformWriter):
+    """Write waveforms to chunked HDF5 datasets. Requires h5py
+
+        Datasets, for each channel:
+
+            C<n>:           adc codes, shape (nrecords, npts), chunked by row. Has the
+                            preamble of the first record as attributes.
+            C<n>_scale:     SCALE_DTYPE for each record, shape (nrecords, )
+    """
+
+    def __init__(self, path, compression=None):
+        """ Init.
+
+        Args:
+            path (str): path to HDF5 file, overwritten if it exists
+            compression (str|None): passed to h5py create_dataset, ex: gzip|lzf
+        """
+        if h5py is None:
+            raise RuntimeError('HDF5Writer requires h5py, install with "pip install h5py"')
+
+        super().__init__()
+        self.file = h5py.File(path, 'w')
+        self.compression = compression
+        self._first_preamble = {}
+        self._offset = {}   # number of codes written to dataset, by channel
+
+    def _first(self, ch, preamble):
+        self._first_preamble[ch] = preamble
+
+    def _append(self, ch, name, data, dtype, width):
+        dname = f'C{ch}' if name == 'codes' else f'C{ch}_{name}'
+
+        if dname not in self.file:
+            if width is None:
+                self.file.create_dataset(dname, shape=(0, ), maxshape=(None, ),
+                                         dtype=dtype, chunks=True)
+            else:
+                self.file.create_dataset(dname, shape=(0, width), maxshape=(None, width),
+                                         dtype=dtype, chunks=(1, width),
+                                         compression=self.compression)
+                for key, value in self._first_preamble.pop(ch, {}).items():
+                    self.file[dname].attrs[key] = value
+                self._offset[ch] = 0
+
+        dset = self.file[dname]
+
+        # scale: one row per record
+        if width is None:
+            dset.resize((len(dset) + len(data), ))
+            dset[-len(data):] = data
+            return
+
+        if width != dset.shape[1]:
+            raise RuntimeError(f'Number of points of C{ch} changed from {dset.shape[1]} to {width}')
+
+        # codes: piece of the current row
+        start = self._offset[ch]
+        row, col = divmod(start, width)
+        if row >= len(dset):
+            dset.resize((row+1, width))
+        dset[row, col:col+len(data)] = data
+        self._offset[ch] += len(data)
+
+    def close(self):
+        self.file.close()
@@ -1,6 +1,13 @@
-__all__ = ['SDS5034', 'SPD3303', 'SiglentBase', 'RIGOL_DG1032Z']
+__all__ = ['SDS5034', 'SPD3303', 'SiglentBase', 'RIGOL_DG1032Z', 'SocketTransport', 'Waveform',
+           'WaveformStore', 'LatestStore', 'RingStore',
+           'WaveformWriter', 'NpyWriter', 'HDF5Writer', 'WaveMeasure']
 
+from .SocketTransport import SocketTransport
 from .SiglentBase import SiglentBase
+from .Waveform import Waveform
+from .WaveformStore import WaveformStore, LatestStore, RingStore
+from .WaveformWriter import WaveformWriter, NpyWriter, HDF5Writer
 from .SDS5034 import SDS5034
+from .WaveMeasure import WaveMeasure
 from .SPD3303 import SPD3303
 from .RIGOL_DG1032Z import DG1032Z
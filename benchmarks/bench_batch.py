@@ -0,0 +1,49 @@
+"""
+    Time a 20-setting acquisition setup of the SDS5034 with and without
+    SiglentBase.batch, against the local emulator with a 1 ms response latency.
+
+    Run from the repository root: python -m benchmarks.bench_batch
+"""
+
+import time
+from SiglentDevices import SDS5034
+from SiglentDevices.Emulator import Emulator
+
+LATENCY = 1e-3
+NREPEAT = 10
+
+def setup(sds):
+    """Configure 4 channels and the timebase: 20 settings"""
+    for ch in range(1, 5):
+        sds.set_ch_scale(ch, 0.5)
+        sds.set_ch_offset(ch, 0)
+        sds.set_ch_coupling(ch, 'DC')
+        sds.set_ch_state(ch, True)
+    sds.set_time_scale(1e-3)
+    sds.set_time_delay(0)
+    sds.set_trig_mode('normal')
+    sds.set_wave_width('byte')
+
+def main():
+    with Emulator('SDS5034', latency=LATENCY) as emu:
+        sds = SDS5034('127.0.0.1', transport='socket', port=emu.port)
+
+        t0 = time.perf_counter()
+        for _ in range(NREPEAT):
+            setup(sds)
+        t_write = (time.perf_counter() - t0) / NREPEAT
+
+        t0 = time.perf_counter()
+        for _ in range(NREPEAT):
+            with sds.batch():
+                setup(sds)
+        t_batch = (time.perf_counter() - t0) / NREPEAT
+
+        sds.close()
+
+    print(f'write + *OPC? each  {t_write*1e3:8.2f} ms')
+    print(f'batch               {t_batch*1e3:8.2f} ms')
+    print(f'speedup             {t_write/t_batch:8.1f}x')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+    Time a 4-channel read of the SDS5034, one channel after the other and with
+    read_wave_active (decode overlapped with transfer), against the local
+    emulator with 1 ms response latency and 100 MB/s bandwidth. The emulator
+    runs in the same process and competes for the GIL, so the overlap is
+    smaller than against the device.
+
+    Run from the repository root: python -m benchmarks.bench_read_active
+"""
+
+import time
+import pandas as pd
+from SiglentDevices import SDS5034
+from SiglentDevices.Emulator import Emulator
+
+LATENCY = 1e-3
+BANDWIDTH = 100e6
+NPTS = 2_000_000
+NREPEAT = 5
+
+def read_serial(sds):
+    """Read all active channels one after another"""
+    waves = [sds.read_wave_ch(ch) for ch in range(1, 5) if sds.get_ch_state(ch)]
+    return pd.concat(waves, axis='columns')
+
+def main():
+    with Emulator('SDS5034', latency=LATENCY, bandwidth=BANDWIDTH,
+                  npts=NPTS, maxpoint=NPTS) as emu:
+        sds = SDS5034('127.0.0.1', transport='socket', port=emu.port)
+        for ch in range(1, 5):
+            sds.set_ch_state(ch, True)
+        sds.set_wave_npts(0)
+
+        t0 = time.perf_counter()
+        for _ in range(NREPEAT):
+            read_serial(sds)
+        t_serial = (time.perf_counter() - t0) / NREPEAT
+
+        t0 = time.perf_counter()
+        for _ in range(NREPEAT):
+            sds.read_wave_active()
+        t_active = (time.perf_counter() - t0) / NREPEAT
+
+        sds.close()
+
+    t_transfer = 4*NPTS / BANDWIDTH
+    print(f'pure transfer       {t_transfer*1e3:8.1f} ms')
+    print(f'one by one          {t_serial*1e3:8.1f} ms')
+    print(f'read_wave_active    {t_active*1e3:8.1f} ms')
+
+if __name__ == '__main__':
+    main()
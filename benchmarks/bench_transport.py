@@ -0,0 +1,91 @@
+"""
+    Compare latency and throughput of the SCPI transports against a local
+    socket stand-in for the device.
+
+    pyvisa is used with a SOCKET resource as the reference, since VXI-11 needs
+    a portmapper and can't be served locally. On a real device the VXI-11
+    (INSTR) resource adds a further RPC round-trip per message.
+
+    Run from the repository root: python -m benchmarks.bench_transport
+"""
+
+import socket, threading, time
+import numpy as np
+import pyvisa
+from SiglentDevices.SocketTransport import SocketTransport
+
+# response sizes
+IDN = b'Siglent Technologies,SDS5034X,SDS00000000000,1.0.0.0\n'
+NBYTES_DATA = 10*1024*1024
+NQUERY = 2000
+NDATA = 10
+
+def serve(server):
+    """Answer *IDN? and WAV:DATA? until the client disconnects"""
+    block = b'#9%09d' % NBYTES_DATA + bytes(NBYTES_DATA) + b'\n\n'
+
+    while True:
+        try:
+            conn, _ = server.accept()
+        except OSError:
+            return
+
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with conn, conn.makefile('rb') as fid:
+            for line in fid:
+                line = line.strip()
+                if line == b'*IDN?':
+                    conn.sendall(IDN)
+                elif line == b'WAV:DATA?':
+                    conn.sendall(block)
+
+def bench(name, dev):
+    """Time small queries and large block reads"""
+
+    # latency
+    t0 = time.perf_counter()
+    for _ in range(NQUERY):
+        dev.query('*IDN?')
+    latency = (time.perf_counter() - t0) / NQUERY
+
+    # throughput
+    buffer = np.empty(NBYTES_DATA, dtype=np.uint8)
+    t0 = time.perf_counter()
+    for _ in range(NDATA):
+        dev.write('WAV:DATA?')
+        head = dev.read_bytes(11)
+        nbytes = int(head[2:])
+        if isinstance(dev, SocketTransport):
+            dev.read_bytes_into(buffer[:nbytes])
+        else:
+            buffer[:nbytes] = np.frombuffer(dev.read_bytes(nbytes), dtype=np.uint8)
+        dev.read_bytes(2)
+    throughput = NDATA * NBYTES_DATA / (time.perf_counter() - t0)
+
+    print(f'{name:<20} {latency*1e6:10.1f} us/query {throughput/1e6:10.1f} MB/s')
+
+def main():
+
+    # start stand-in device
+    server = socket.create_server(('127.0.0.1', 0))
+    port = server.getsockname()[1]
+    threading.Thread(target=serve, args=(server,), daemon=True).start()
+
+    # pyvisa socket resource
+    rm = pyvisa.ResourceManager('@py')
+    dev = rm.open_resource(f'TCPIP::127.0.0.1::{port}::SOCKET')
+    dev.read_termination = '\n'
+    dev.write_termination = '\n'
+    dev.chunk_size = 20*1024*1024
+    bench('pyvisa (SOCKET)', dev)
+    dev.close()
+
+    # raw socket
+    dev = SocketTransport('127.0.0.1', port=port)
+    bench('SocketTransport', dev)
+    dev.close()
+
+    server.close()
+
+if __name__ == '__main__':
+    main()
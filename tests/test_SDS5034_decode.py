@@ -0,0 +1,77 @@
+# Test waveform decoding of SDS5034 against the original python loop
+# Does not require a connection to the device
+
+from SiglentDevices import SDS5034
+import numpy as np
+
+# scaling values taken from a typical preamble
+code_per_div = 30.0
+v_per_div = 0.5
+v_offset = 0.125
+
+def _decode_loop(recv_all, nbits):
+    """
+        Original per-sample decoding from SDS5034.read_wave_ch, used as reference
+    """
+
+    recv_all = list(recv_all)
+
+    # convert bits to float
+    if nbits > 8:
+        convert_data = []
+        for i in range(0, int(len(recv_all) / 2)):
+            data_16bit = recv_all[2 * i + 1] * 256 + recv_all[2 * i]
+            data = data_16bit >> (16-nbits)
+            convert_data.append(data)
+    else:
+        convert_data = recv_all
+
+    # convert ints to volts
+    volt_value = []
+    for data in convert_data:
+        if data > pow(2, nbits-1)-1:
+            data = data - pow(2, nbits)
+        volt_value.append(data)
+
+    volt_value = np.array(volt_value)
+
+    if nbits == 10:
+        volt_value = volt_value/4
+
+    return volt_value / code_per_div * v_per_div - v_offset
+
+def _test_decode(nbits, payload):
+    volts = SDS5034.decode_wave(payload, nbits,
+                                code_per_div=code_per_div,
+                                v_per_div=v_per_div,
+                                v_offset=v_offset)
+    assert np.array_equal(volts, _decode_loop(payload, nbits)), f'{nbits} bit decode mismatch'
+
+def test_decode_8bit():
+    _test_decode(8, bytes(range(256)) * 4)
+
+def test_decode_10bit():
+
+    # all 10 bit codes, left-aligned in little-endian 16 bit words
+    codes = np.arange(-512, 512, dtype='<i2') << 6
+    _test_decode(10, codes.tobytes())
+
+def test_decode_random():
+    rng = np.random.default_rng(0)
+    payload = rng.integers(0, 256, 10001, dtype=np.uint8).tobytes()
+    _test_decode(8, payload)
+    _test_decode(10, payload)
+
+def test_parse_preamble():
+    from SiglentDevices.Emulator import EmulatedSDS5034
+
+    device = EmulatedSDS5034()
+    device.wave_ch = 3
+    block = device._block(device.wavedesc())
+
+    pre = SDS5034.parse_wave_preamble(block)
+    assert pre == SDS5034.parse_wave_preamble(device.wavedesc())
+    assert pre['descriptor'] == 'WAVEDESC'
+    assert pre['wave_desc_bytes'] == 346
+    assert pre['data_npts'] == device.npts
+    assert pre['channel'] == 'C3'
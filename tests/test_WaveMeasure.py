@@ -0,0 +1,70 @@
+# Test host side measurements against known waveforms
+# Does not require a connection to the device
+
+from SiglentDevices import WaveMeasure, Waveform
+import numpy as np
+import pandas as pd
+
+meas = WaveMeasure()
+dt = 1e-6
+t0 = -5e-3
+time_s = t0 + np.arange(10000) * dt
+
+def _square(freq, duty, high=2.0, low=0.0):
+    phase = ((time_s - t0) * freq + 0.25) % 1
+    return np.where(phase < duty/100, high, low)
+
+def test_square():
+    val = meas.measure(_square(1e3, 30), dt=dt, t0=t0)
+    assert np.isclose(val['FREQ'], 1e3, rtol=1e-3)
+    assert np.isclose(val['PER'], 1e-3, rtol=1e-3)
+    assert np.isclose(val['DUTY'], 30, atol=0.2)
+    assert np.isclose(val['NDUTY'], 70, atol=0.2)
+    assert np.isclose(val['PWID'], 0.3e-3, rtol=1e-2)
+    assert val['TOP'] == 2 and val['BASE'] == 0 and val['AMPL'] == 2
+    assert val['REDGES'] == 10 and val['FEDGES'] == 10
+    assert val['CYCLES'] == 9
+    assert np.isclose(val['CMEAN'], 0.6, atol=1e-2)
+    assert val['RISE'] < 2*dt
+    assert np.isnan(val['TIMEL'])
+
+def test_frames():
+    freq = np.array([500, 1e3, 2e3, 4e3])
+    volts = np.sin(2*np.pi*freq[:, None]*time_s)
+
+    val = meas.measure(volts, ['freq', 'pkpk', 'rms', 'levelx'], dt=dt, t0=t0)
+    assert val['FREQ'].shape == (4, )
+    assert np.allclose(val['FREQ'], freq, rtol=1e-3)
+    assert np.allclose(val['PKPK'], 2, atol=1e-3)
+    assert np.allclose(val['RMS'], 1/np.sqrt(2), rtol=1e-2)
+    assert np.allclose(val['LEVELX'], 0)
+
+    # each frame as measured alone
+    for i in range(len(freq)):
+        assert meas.measure(volts[i], 'freq', dt=dt, t0=t0) == val['FREQ'][i]
+
+    # channels by frames
+    val3 = meas.measure(np.stack((volts, 2*volts)), 'ampl', dt=dt, t0=t0)
+    assert val3.shape == (2, 4)
+    assert np.allclose(val3[1], 2*val3[0])
+
+def test_no_edges():
+    val = meas.measure(np.full(1000, 0.5), dt=dt)
+    assert val['PKPK'] == 0
+    assert val['MEAN'] == 0.5
+    assert np.isnan(val['FREQ'])
+    assert np.isnan(val['CMEAN'])
+    assert val['EDGES'] == 0
+
+def test_frame_and_waveform():
+    codes = (_square(2e3, 50, high=60, low=-60)).astype(np.int8)
+    wave = Waveform(1, codes, 8, code_per_div=30.0, v_per_div=0.5, v_offset=0, t0=t0, dt=dt)
+
+    df = wave.to_frame()
+    assert np.isclose(meas.measure(wave, 'freq'), 2e3, rtol=1e-2)
+    assert np.isclose(meas.measure(df, 'freq')['C1'], 2e3, rtol=1e-2)
+
+    df = meas.measure(wave.to_frame(time_index=False), ['pkpk', 'duty'])
+    assert list(df.index) == ['C1']
+    assert np.isclose(df.loc['C1', 'PKPK'], 2)
+    assert np.isclose(df.loc['C1', 'DUTY'], 50, atol=0.2)
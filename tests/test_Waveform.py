@@ -0,0 +1,37 @@
+# Test Waveform conversion and plotting envelope
+# Does not require a connection to the device
+
+from SiglentDevices import Waveform
+import numpy as np
+
+def _wave(npts):
+    rng = np.random.default_rng(0)
+    codes = rng.integers(-128, 128, npts).astype(np.int8)
+    return Waveform(1, codes, 8, code_per_div=30.0, v_per_div=0.5, v_offset=0.1,
+                    t0=-5e-3, dt=1e-6)
+
+def test_envelope_small():
+    wave = _wave(1000)
+    t, volts = wave.envelope(nbins=1000)
+    assert np.allclose(t, wave.time)
+    assert np.array_equal(volts, wave.volts())
+
+def test_envelope():
+    wave = _wave(1_000_003)
+    t, volts = wave.envelope(nbins=2000)
+    assert len(t) <= 2*2001
+    assert np.all(np.diff(t) > 0)
+
+    # extremes are kept, and points are on the waveform
+    full = wave.volts()
+    assert volts.max() == full.max()
+    assert volts.min() == full.min()
+    idx = np.round((t - wave.t0) / wave.dt).astype(int)
+    assert np.array_equal(volts, full[idx])
+
+def test_envelope_zoom():
+    wave = _wave(1_000_000)
+    t, volts = wave.envelope(tmin=-4e-3, tmax=-3e-3, nbins=100)
+    assert t[0] >= -4e-3 - wave.dt
+    assert t[-1] <= -3e-3 + wave.dt
+    assert volts.max() == wave.volts()[999:2001].max()
@@ -0,0 +1,568 @@
+# Test device classes against the local SCPI emulator
+# Does not require a connection to the device
+
+from SiglentDevices import SDS5034, SPD3303, DG1032Z, Waveform, WaveformStore, LatestStore, RingStore
+from SiglentDevices import NpyWriter, HDF5Writer, WaveMeasure
+from SiglentDevices.Emulator import Emulator
+import numpy as np
+import pandas as pd
+import pytest
+import time
+
+# start emulators and connect
+emu_sds = Emulator('SDS5034')
+emu_spd = Emulator('SPD3303')
+emu_awg = Emulator('DG1032Z')
+
+s = SDS5034('127.0.0.1', transport='socket', port=emu_sds.port)
+p = SPD3303('127.0.0.1', transport='socket', port=emu_spd.port)
+g = DG1032Z('127.0.0.1', transport='socket', port=emu_awg.port)
+
+# testing basic set and queries
+def _test_get_set(fn_str, val_list, ch=-1):
+    """
+        Test by setting a value and getting a value
+    """
+
+    fn_get = getattr(s, f'get_{fn_str}')
+    fn_set = getattr(s, f'set_{fn_str}')
+
+    if ch > 0:
+        fn_get = lambda fn=fn_get: fn(ch)
+        fn_set = lambda val, fn=fn_set: fn(ch, val)
+
+    init = fn_get()
+
+    for val in val_list:
+        fn_set(val)
+        assert fn_get() == val, f'{fn_str} set or read failed'
+
+    fn_set(init)
+
+def test_ch_offset():
+    _test_get_set('ch_offset', (1, -0.001, 0.25, 0), ch=1)
+
+def test_ch_scale():
+    _test_get_set('ch_scale', (3, 0.01, 1), ch=1)
+
+def test_time_delay():
+    _test_get_set('time_delay', (1e-6, 1.34e-6, 5e-6, 0))
+
+def test_trig_mode():
+    _test_get_set('trig_mode', ('single', 'auto', 'normal'))
+
+def test_wave_width():
+    _test_get_set('wave_width', ('byte', 'word'))
+
+def test_preamble():
+    s.set_adc_resolution(8)
+    pre = s.get_wave_preamble(2)
+    assert pre['descriptor'] == 'WAVEDESC'
+    assert pre['wave_desc_bytes'] == 346
+    assert pre['data_npts'] == emu_sds.device.npts
+    assert pre['channel'] == 'C2'
+
+def test_read_wave():
+    for bits in (8, 10):
+        s.set_adc_resolution(bits)
+        s.set_wave_npts(0)
+        df = s.read_wave_ch(1)
+        assert np.allclose(df['C1'].values, emu_sds.device.volts(1)), f'{bits} bit read failed'
+
+def test_spd_measure():
+    p.set_voltage(2, 5)
+    p.set_ch_state(2, True)
+    assert p.get_voltage(2) == 5
+    assert p.get_current(2) == 5 / emu_spd.device.load
+    p.set_ch_state(2, False)
+
+def test_spd_timer():
+    p.set_timer_par(1, 3, 1.5, 0.5, 10)
+    assert p.get_timer_par(1, 3) == {'volt': 1.5, 'amp': 0.5, 'sec': 10}
+
+def test_awg_wave():
+    g.set_wave(1, 'SIN', freq=1000, vpp=2, offset=0.5)
+    assert g.get_wave(1) == {'wave': 'SIN', 'freq': 1000, 'amp': 2, 'offset': 0.5, 'phase': 0}
+
+def test_awg_custom():
+    volts = np.sin(np.linspace(0, 2*np.pi, 12000))
+    g.set_wave_custom(2, volts, period=1e-3)
+    assert len(emu_awg.device.arb[2]) == len(volts)
+    assert not emu_awg.device.errors
+
+def test_batch():
+    nmessages = emu_sds.nmessages
+    with s.batch():
+        s.set_ch_scale(3, 0.5)
+        s.set_ch_offset(3, 0.1)
+        s.set_time_delay(1e-6)
+    assert s.get_ch_scale(3) == 0.5
+    assert s.get_ch_offset(3) == 0.1
+    assert s.get_time_delay() == 1e-6
+
+    # 3 writes, *OPC? and SYST:ERR?, then 3 queries
+    assert emu_sds.nmessages - nmessages == 8
+
+def test_batch_errors():
+    try:
+        with s.batch():
+            s.write('NOT:A:COMMand 1')
+    except RuntimeError as err:
+        assert 'Undefined header' in str(err)
+    else:
+        assert False, 'batch errors not reported'
+
+def test_cache_settings():
+    s.cache_settings = True
+    s.set_adc_resolution(8)
+    s.set_wave_npts(emu_sds.device.maxpoint)
+    s.read_wave_ch(1)
+
+    # only *ESR? and WAV:DATA? once settings and preamble are known
+    nmessages = emu_sds.nmessages
+    df = s.read_wave_ch(1)
+    assert emu_sds.nmessages - nmessages == 2
+
+    # preamble is read again after a change of scale
+    s.set_ch_scale(1, 0.5)
+    df = s.read_wave_ch(1)
+    assert np.allclose(df['C1'].values, emu_sds.device.volts(1)[:len(df)])
+    s.set_ch_scale(1, 1)
+
+    # front panel changes are picked up
+    emu_sds.device.touch(adc_bit=10)
+    df = s.read_wave_ch(1)
+    assert s.get_adc_resolution() == 10
+    assert np.allclose(df['C1'].values, emu_sds.device.volts(1)[:len(df)])
+
+    # aborted batch: settings written in it are read from the device again
+    s.set_adc_resolution(8)
+    s.read_wave_ch(1)
+    with pytest.raises(KeyError):
+        with s.batch():
+            s.set_wave_ch(2)
+            s.set_adc_resolution(10)
+            raise KeyError()
+    assert s.get_adc_resolution() == 8
+    df = s.read_wave_ch(2)
+    assert np.allclose(df['C2'].values, emu_sds.device.volts(2)[:len(df)])
+
+    # batch with device errors
+    with pytest.raises(RuntimeError):
+        with s.batch():
+            s.set_adc_resolution(10)
+            s.write('NOT:A:COMMand 1')
+    assert s.get_adc_resolution() == emu_sds.device.adc_bit
+
+    s.cache_settings = False
+    s.refresh()
+
+def test_read_wave_sequence():
+
+    # several transfers of 10 frames
+    with Emulator('SDS5034', npts=100, maxpoint=1000) as emu:
+        sds = SDS5034('127.0.0.1', transport='socket', port=emu.port)
+        sds.set_sequence(True)
+        sds.set_sequence_count(32)
+
+        time_s, volts, stamps = sds.read_wave_sequence(2, timestamps=True)
+        assert volts.shape == (32, 100)
+        assert time_s.shape == (100, )
+        assert np.allclose(volts, emu.device.volts(2, sequence=True))
+
+        frame_times = emu.device.frame_times
+        assert np.allclose(stamps, frame_times - frame_times[0], atol=1e-5)
+
+        # sequence setting restored if a transfer fails
+        sds.set_wave_sequence(3)
+        write = sds.write
+        def fail(message, **kwargs):
+            if message.startswith('WAV:DATA?'):
+                raise TimeoutError()
+            return write(message, **kwargs)
+        sds.write = fail
+        with pytest.raises(TimeoutError):
+            sds.read_wave_sequence(2)
+        assert sds.get_wave_sequence() == (3, 1)
+        sds.close()
+
+def test_stream_acquisitions():
+    s.set_wave_npts(0)
+    nacquisitions = emu_sds.device.nacquisitions
+
+    for df in s.stream_acquisitions((1, 2), n=5):
+        assert list(df.columns) == ['C1', 'C2']
+        assert len(df) == emu_sds.device.npts
+
+    assert s.stream_stats['delivered'] == 5
+    assert s.stream_stats['triggers'] >= 5
+    assert emu_sds.device.nacquisitions - nacquisitions == s.stream_stats['triggers']
+
+    # channels joined by position, as read_wave_active
+    for df in s.stream_acquisitions((1, 2), n=1, time_index=False):
+        assert list(df.index) == list(range(emu_sds.device.npts))
+        assert np.allclose(df['C2'].values, emu_sds.device.volts(2))
+        assert 'dt' in df.attrs
+    s.set_trig_mode('auto')
+
+def test_read_wave_active():
+    s.set_adc_resolution(8)
+    s.set_wave_npts(0)
+    s.set_ch_state(3, True)
+
+    df = s.read_wave_active()
+    assert list(df.columns) == ['C1', 'C2', 'C3']
+    for ch in (1, 2, 3):
+        assert np.allclose(df[f'C{ch}'].values, emu_sds.device.volts(ch))
+
+    s.set_ch_state(3, False)
+    assert s.get_ch_states() == [True, True, False, False]
+
+def test_read_wave_raw():
+    s.set_wave_npts(0)
+    for bits, dtype in ((8, np.int8), (10, np.int16)):
+        s.set_adc_resolution(bits)
+        wave = s.read_wave_ch(1, raw=True)
+        df = s.read_wave_ch(1)
+        assert wave.codes.dtype == dtype
+        assert np.array_equal(wave.volts(), df['C1'].values)
+        assert np.allclose(wave.time, df.index.values)
+
+    df32 = s.read_wave_ch(1, dtype=np.float32)
+    assert df32['C1'].dtype == np.float32
+    assert np.allclose(df32['C1'].values, df['C1'].values, atol=1e-5)
+    s.set_adc_resolution(8)
+
+def test_read_wave_time_index():
+    s.set_wave_npts(0)
+    df = s.read_wave_active()
+    df_pts = s.read_wave_active(time_index=False)
+
+    assert isinstance(df_pts.index, pd.RangeIndex)
+    assert np.array_equal(df_pts.values, df.values)
+    time_s = df_pts.attrs['t0'] + df_pts.index.values * df_pts.attrs['dt']
+    assert np.allclose(time_s, df.index.values)
+
+def test_waveform_join():
+    codes = np.arange(10, dtype=np.int8)
+    w1 = Waveform(1, codes, 8, 25, 1, 0, t0=0, dt=1e-3)
+    w2 = Waveform(2, codes, 8, 25, 1, 0, t0=0, dt=1e-3)
+    w3 = Waveform(3, codes, 8, 25, 1, 0, t0=5e-4, dt=1e-3)
+
+    df = Waveform.join([w1, w2], time_index=False)
+    assert list(df.index) == list(range(10)) and df.attrs['dt'] == 1e-3
+
+    # different time axes are aligned on time
+    assert len(Waveform.join([w1, w3])) == 20
+    with pytest.raises(RuntimeError):
+        Waveform.join([w1, w3], time_index=False)
+
+def test_waveform_store():
+    s.set_adc_resolution(8)
+    s.set_wave_npts(emu_sds.device.maxpoint)
+
+    # last 3 waveforms
+    s.store = RingStore(depth=3)
+    waves = [s.read_wave_ch(1, raw=True) for _ in range(5)]
+    history = s.store.history(1)
+    assert len(history) == 3
+    for wave, stored in zip(waves[2:], history):
+        assert np.array_equal(wave.codes, stored.codes)
+    assert np.array_equal(s.waveforms['C1'].values, waves[-1].volts())
+
+    # memory limit
+    s.store = RingStore(depth=100, max_bytes_per_ch=2.5*emu_sds.device.maxpoint)
+    for _ in range(5):
+        s.read_wave_ch(1)
+    assert len(s.store.history(1)) == 2
+
+    # keep nothing
+    s.store = WaveformStore()
+    s.read_wave_ch(1)
+    assert s.waveforms.empty
+
+    # assign to waveforms
+    s.store = LatestStore()
+    wave = s.read_wave_ch(1, raw=True)
+    s.waveforms = {}
+    assert s.waveforms.empty and s.store.latest(1) is None
+    s.waveforms = [wave]
+    assert np.array_equal(s.waveforms['C1'].values, wave.volts())
+    with pytest.raises(RuntimeError):
+        s.waveforms = pd.DataFrame({'C1': wave.volts()})
+
+def _test_writer(writer, load):
+    s.set_adc_resolution(10)
+    s.set_wave_npts(0)
+
+    with writer:
+        for _ in range(3):
+            s.record_wave_ch(1, writer)
+    codes, scale = load()
+
+    # 2 pieces per waveform
+    assert codes.shape == (3, emu_sds.device.npts)
+    assert codes.dtype == np.int16
+    volts = Waveform.to_volts(codes[-1], scale['nbits'][-1], scale['code_per_div'][-1],
+                              scale['v_per_div'][-1], scale['v_offset'][-1])
+    assert np.allclose(volts, emu_sds.device.volts(1))
+    assert np.all(scale['npts'] == emu_sds.device.npts)
+    s.set_adc_resolution(8)
+
+def test_writer_abort(tmp_path):
+    path = str(tmp_path / 'run')
+    writer = NpyWriter(path)
+
+    with Emulator('SDS5034', npts=1000, maxpoint=400) as emu:
+        sds = SDS5034('127.0.0.1', transport='socket', port=emu.port)
+        sds.set_wave_npts(0)
+
+        # fail on the second piece
+        write = sds.write
+        npieces = []
+        def fail(message, **kwargs):
+            if message == 'WAV:DATA?':
+                npieces.append(message)
+                if len(npieces) == 2:
+                    raise TimeoutError()
+            return write(message, **kwargs)
+        sds.write = fail
+        with pytest.raises(TimeoutError):
+            sds.record_wave_ch(1, writer)
+        sds.write = write
+
+        # number of points restored
+        assert sds.get_wave_npts() == 1000
+        assert len(sds.read_wave_ch(1, raw=True)) == 1000
+
+        # record closed and can be started again
+        sds.record_wave_ch(1, writer)
+    writer.close()
+
+    scale = np.load(f'{path}/C1_scale.npy')
+    assert list(scale['npts']) == [400, 1000]
+    codes = np.load(f'{path}/C1.npy')
+    assert codes.shape == (2, 1000)
+    assert np.all(codes[0, 400:] == 0)
+
+def test_npy_writer(tmp_path):
+    path = str(tmp_path / 'run')
+    _test_writer(NpyWriter(path),
+                 lambda: (np.load(f'{path}/C1.npy', mmap_mode='r'), np.load(f'{path}/C1_scale.npy')))
+
+def test_hdf5_writer(tmp_path):
+    h5py = pytest.importorskip('h5py')
+    path = str(tmp_path / 'run.h5')
+
+    def load():
+        with h5py.File(path, 'r') as fid:
+            assert fid['C1'].attrs['descriptor'] == 'WAVEDESC'
+            return fid['C1'][:], fid['C1_scale'][:]
+
+    _test_writer(HDF5Writer(path), load)
+
+def test_measure_adv_all():
+    with s.batch():
+        for idx, item, ch in ((1, 'pkpk', 1), (2, 'mean', 2), (4, 'duty', 1)):
+            s.set_measure_adv_item(idx, item)
+            s.set_measure_adv_source(idx, ch)
+            s.set_measure_adv_state(idx, True)
+
+    meas = s.get_measure_adv_all()
+    assert list(meas.idx) == [1, 2, 4]
+    assert list(meas.type) == ['pkpk', 'mean', 'duty']
+    assert list(meas.source) == ['C1', 'C2', 'C1']
+    assert np.isclose(meas.value[0], emu_sds.device.measure_value('PKPK', 1))
+    assert np.isclose(meas.value[1], emu_sds.device.measure_value('MEAN', 2))
+    assert np.isnan(meas.value[2])
+
+    assert len(s.get_measure_adv_all(active_only=False)) == 12
+
+def test_measure_simple_all():
+    s.set_measure_simple_source(2)
+    values = s.get_measure_simple_all()
+
+    assert list(values.keys()) == SDS5034.MEASUREMENT_ITEMS
+    assert np.isclose(values['PKPK'], emu_sds.device.measure_value('PKPK', 2))
+    assert np.isclose(values['FREQ'], emu_sds.device.measure_value('FREQ', 2))
+    assert np.isnan(values['DUTY'])
+    assert np.isnan(values['ABSACArea'])
+    assert s.get_measure_simple_value('mean') == values['MEAN']
+
+def test_measure_settle():
+    s.set_measure_mode('advanced')
+    s.set_measure_simple_source(1)
+    s.get_measure_simple_value('pkpk', ch=2)
+    assert s.get_measure_mode() == 'simple'
+    assert s.get_measure_simple_source() == 2
+
+def test_measure_settle_run():
+
+    # value changes on every acquisition, source changes take effect after 0.1 s
+    with Emulator('SDS5034', npts=1000, measure_update=0.1) as emu:
+        sds = SDS5034('127.0.0.1', transport='socket', port=emu.port)
+        sds.set_measure_simple_source(1)
+        assert sds.get_measure_simple_value('stdev') != sds.get_measure_simple_value('stdev')
+
+        # no wait by default, reads the old channel
+        assert sds.get_measure_simple_value('freq', ch=2) == emu.device.measure_value('FREQ', 1)
+
+        sds.settle_run = 0.2
+        assert sds.get_measure_simple_value('freq', ch=1) == emu.device.measure_value('FREQ', 1)
+        assert sds.get_measure_simple_value('freq', ch=2) == emu.device.measure_value('FREQ', 2)
+        assert sds.settle_time >= 0.2
+
+        # stopped: no wait
+        sds.set_run_state(False)
+        assert sds.get_measure_simple_value('freq', ch=1) == emu.device.measure_value('FREQ', 1)
+        assert sds.settle_time < 0.1
+        sds.close()
+
+def test_wave_measure():
+    s.set_wave_npts(0)
+    df = s.read_wave_active()
+    values = WaveMeasure().measure(df, ['pkpk', 'mean', 'freq'])
+
+    for ch in (1, 2):
+        for item in ('PKPK', 'MEAN', 'FREQ'):
+            assert np.isclose(values.loc[f'C{ch}', item], emu_sds.device.measure_value(item, ch), rtol=1e-2)
+
+def test_spd_read_all():
+    p.set_voltage(1, 5)
+    p.set_current(1, 0.1)
+    p.set_ch_state(1, True)
+    p.set_voltage(2, 3)
+    p.set_ch_state(2, True)
+
+    # 9 measurements and the status register
+    p.get_id()
+    nmessages = emu_spd.nmessages
+    reading = p.read_all()
+    assert emu_spd.nmessages - nmessages == 10
+
+    # CH1 current limited, CH2 constant voltage
+    assert reading.CH1_amp == 0.1
+    assert reading.CH1_volt == 0.1 * emu_spd.device.load
+    assert reading.CH2_volt == 3
+    assert reading.CH2_power == p.get_power(2)
+    assert reading.CH1_on and reading.CH2_on
+    assert reading.CH1_cc and not reading.CH2_cc
+    assert reading.latency > 0
+
+    status = p.get_status()
+    assert status['mode'] == 'independent'
+    assert status['status'] == reading.status
+
+    p.set_ch_state(1, False)
+    p.set_ch_state(2, False)
+    assert not p.read_all((1, 2)).CH1_on
+
+def test_spd_logging():
+    p.set_voltage(1, 2)
+    p.set_current(1, 1)
+    p.set_ch_state(1, True)
+
+    p.start_logging(rate_hz=200, channels=(1, 2), capacity=20)
+    time.sleep(0.2)
+
+    # other calls are interleaved with readings
+    assert p.get_voltage(1) == 2
+    p.stop_logging()
+    assert not p.logging
+
+    log = p.get_log()
+    stats = p.get_log_stats()
+    assert len(log) == 20
+    assert stats['samples'] > 20
+    assert np.all(np.diff(log.time) > 0)
+    assert np.all(log.CH1_volt == 2)
+    assert stats['rate_hz'] == pytest.approx(200, rel=0.2)
+    assert stats['latency_p50'] <= stats['latency_max']
+
+    df = p.get_log_frame()
+    assert df.index.name == 'time'
+    assert np.array_equal(df['CH1_volt'].values, log.CH1_volt)
+    p.set_ch_state(1, False)
+
+def test_spd_profile():
+    t = np.linspace(0, 0.1, 11)
+    ramp = np.column_stack((t, 10*t, np.full(len(t), 1.0)))
+    steps = np.array([[0, 1.0, 0.5], [2, 2.0, 0.5], [5, 1.5, 0.2]])
+
+    errors = p.run_profile({1: ramp, 2: steps})
+
+    # CH1 written by host, CH2 by the timer of the device
+    assert np.all(np.abs(errors[1]) < 0.01)
+    assert p.get_timer_par(2, 1) == {'volt': 1.0, 'amp': 0.5, 'sec': 2}
+    assert p.get_timer_par(2, 3) == {'volt': 1.5, 'amp': 0.2, 'sec': p.TIMER_MAX_S}
+    assert p.get_timer_par(2, 4) == {'volt': 0, 'amp': 0, 'sec': 0}
+    assert emu_spd.device.out[2]['timer']
+    assert np.isfinite(errors[2][0]) and np.all(np.isnan(errors[2][1:]))
+    assert emu_spd.device.out[1]['volt'] == 1.0
+
+    p.set_timer(2, False)
+
+def test_spd_timer_sequence():
+    seq = np.array([[1, 0.5, 2], [2, 0.5, 3], [3, 0.1, 4]])
+
+    p.set_timer_sequence(1, seq)
+    full = p.get_timer_sequence(1)
+    assert full.shape == (5, 3)
+    assert np.array_equal(full[:3], seq)
+    assert np.all(full[3:] == 0)
+
+    # both channels
+    seqs = np.stack((seq, 2*seq))
+    p.set_timer_sequence((1, 2), seqs)
+    assert np.array_equal(p.get_timer_sequence((1, 2))[:, :3], seqs)
+
+    with pytest.raises(RuntimeError):
+        p.set_timer_sequence(1, np.zeros((6, 3)))
+
+    # batches are sent without *OPC? and SYSTem:ERRor?
+    nmessages = emu_spd.nmessages
+    with p.batch():
+        p.set_voltage(1, 1)
+        p.set_current(1, 1)
+    p.get_voltage(1)
+    assert emu_spd.nmessages - nmessages == 3
+
+def test_awg_custom_cache(tmp_path):
+    volts = np.sin(np.linspace(0, 2*np.pi, 12000))
+    g.arb_cache_dir = str(tmp_path)
+    g.set_wave_custom(1, volts, period=1e-3)
+    assert len(list(tmp_path.iterdir())) == 1
+
+    # same waveform: not uploaded again
+    emu_awg.device.arb[1] = np.zeros(0, dtype='<u2')
+    g.set_wave_custom(1, volts, period=2e-3)
+    assert len(emu_awg.device.arb[1]) == 0
+    assert emu_awg.device.src[1]['srate'] == len(volts)/2e-3
+
+    # same shape, larger amplitude: codes are the same
+    g.set_wave_custom(1, 2*volts, period=1e-3)
+    assert len(emu_awg.device.arb[1]) == 0
+    assert np.isclose(emu_awg.device.src[1]['vpp'], 4)
+
+    # other waveform, or forced
+    g.set_wave_custom(1, volts**3, period=1e-3)
+    assert len(emu_awg.device.arb[1]) == len(volts)
+    emu_awg.device.arb[1] = np.zeros(0, dtype='<u2')
+    g.set_wave_custom(1, volts**3, period=1e-3, force=True)
+    assert len(emu_awg.device.arb[1]) == len(volts)
+    assert not emu_awg.device.errors
+
+    g.arb_cache_dir = None
+
+def test_spd_batch_while_logging():
+    p.start_logging(rate_hz=500, channels=(1, 2), capacity=100)
+
+    # readings of the logger are not sent with the queued commands
+    with p.batch():
+        p.set_voltage(1, 1.5)
+        time.sleep(0.05)
+        assert emu_spd.device.out[1]['volt'] != 1.5
+    assert float(p.query('CH1:VOLTage?')) == 1.5
+
+    p.stop_logging()
+    assert p.get_log_stats()['samples'] > 5